@@ -1,35 +1,164 @@
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory, stream_with_context
 import os
+import json
+import time
 from PIL import Image
 import base64
 from dotenv import load_dotenv
-from services.image_service import ImageService
-from services.flyer_generator import FlyerGenerator
-from services.property_service import PropertyService
-from services.maps_service import MapsService
-from services.mortgage_service import MortgageService
-from services.social_service import SocialService
-from services.social_share_service import SocialShareService
-from services.zillow_storytelling_service import ZillowStorytellingService
-from services.ai_marketing_agent import AIMarketingAgent
 
 
 load_dotenv()
 
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'your-secret-key-here')
+# Larger request bodies (photo uploads) are refused with 413 before they are read
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_BYTES', 20 * 1024 * 1024))
 
-# Initialize services
-image_service = ImageService(os.getenv('FREEPIK_API_KEY'))
-flyer_generator = FlyerGenerator()
-property_service = PropertyService()
-maps_service = MapsService()
-mortgage_service = MortgageService()
-social_service = SocialService()
-social_share_service = SocialShareService()
-zillow_storytelling_service = ZillowStorytellingService()
-ai_marketing_agent = AIMarketingAgent()
+# Render workers are spawned processes, which re-import the script that started the server as
+# __mp_main__. They only need services.render_pool, so the services (thread pools, caches, gazetteer,
+# layouts) are imported and built in the serving process alone.
+if __name__ != '__mp_main__':
+    from services.image_service import ImageService, InvalidImageError, ImageDownloadError
+    from services.flyer_generator import FlyerGenerator
+    from services.property_service import PropertyService
+    from services.maps_service import MapsService
+    from services.mortgage_service import MortgageService
+    from services.social_service import SocialService
+    from services.social_share_service import SocialShareService
+    from services.zillow_storytelling_service import ZillowStorytellingService
+    from services.ai_marketing_agent import AIMarketingAgent
+    from services.task_runner import TaskRunner
+    from services.http_client import http_client
+    from services.llm_cache import llm_cache
+    from services.artifact_store import ArtifactStore
+    from services.render_pool import RenderPool, RenderQueueFull
 
+    # Initialize services
+    image_service = ImageService(os.getenv('FREEPIK_API_KEY'))
+    artifact_store = ArtifactStore()
+    render_pool = RenderPool()
+    flyer_generator = FlyerGenerator(artifact_store, render_pool=render_pool)
+    property_service = PropertyService()
+    maps_service = MapsService()
+    mortgage_service = MortgageService()
+    social_service = SocialService()
+    social_share_service = SocialShareService()
+    zillow_storytelling_service = ZillowStorytellingService()
+    ai_marketing_agent = AIMarketingAgent()
+    task_runner = TaskRunner(max_workers=int(os.getenv('TASK_RUNNER_WORKERS', 16)))
+    # Distinct renders one batch request may queue
+    MAX_FLYER_VARIANTS = int(os.getenv('MAX_FLYER_VARIANTS', 12))
+
+def _fetch_background_image(zillow_image_url, price, bedrooms):
+    """Fetch the Zillow listing photo, falling back to Freepik/Unsplash"""
+    if zillow_image_url:
+        try:
+            return image_service.get_image_from_url(zillow_image_url)
+        except:
+            pass
+    property_type = property_service.detect_property_type(price, bedrooms)
+    image_url = image_service.search_freepik_image(property_type) or image_service.get_fallback_image()
+    try:
+        return image_service.get_image_from_url(image_url)
+    except Exception as e:
+        raise ImageDownloadError(f'{image_url}: {e}') from e
+
+def _open_uploaded_image(uploaded_file):
+    """Open an uploaded photo under the same size and format limits as downloaded ones"""
+    image_bytes = uploaded_file.read(image_service.max_image_bytes + 1)
+    if len(image_bytes) > image_service.max_image_bytes:
+        raise InvalidImageError(f'Uploaded image exceeds {image_service.max_image_bytes} bytes')
+    return image_service.open_image(image_bytes)
+
+def _render_busy_response():
+    response = jsonify({'error': 'Flyer rendering is busy right now. Please try again in a moment.'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '2'
+    return response
+
+def _elapsed_ms(started):
+    return round((time.perf_counter() - started) * 1000, 1)
+
+def _read_flyer_request():
+    """Flyer inputs from a multipart form (with optional photo upload) or a JSON body"""
+    if request.content_type and 'multipart/form-data' in request.content_type:
+        data = request.form
+        uploaded_file = request.files.get('property_image')
+    else:
+        data = request.json or {}
+        uploaded_file = None
+    
+    params = {
+        'address': data.get('address', 'Beautiful Property'),
+        'price': data.get('price', '0'),
+        'bedrooms': data.get('bedrooms', '0'),
+        'bathrooms': data.get('bathrooms', '0'),
+        'template': data.get('template', 'modern'),
+        'format': data.get('format', 'flyer'),
+        'output_format': data.get('output_format', 'png'),
+        'response_mode': data.get('response_mode'),
+        'zillow_image_url': data.get('zillow_image_url'),
+        'variants': data.get('variants')
+    }
+    return params, uploaded_file
+
+def _gather_flyer_inputs(params, uploaded_file):
+    """Fetch the background image and listing data a flyer needs, running the upstream calls together"""
+    address, price, bedrooms = params['address'], params['price'], params['bedrooms']
+    
+    # Uploaded images are opened here; everything else is fetched in parallel below
+    uploaded_image = _open_uploaded_image(uploaded_file) if uploaded_file else None
+    
+    def combine_neighborhood(neighborhood, story):
+        neighborhood['story'] = story
+        return neighborhood
+    
+    # Independent upstream calls run together and join before rendering
+    return task_runner.run({
+        'background': (lambda: uploaded_image or _fetch_background_image(params['zillow_image_url'], price, bedrooms), []),
+        'neighborhood': (lambda: maps_service.get_neighborhood_insights(address), []),
+        'mortgage': (lambda: mortgage_service.calculate_mortgage(price), []),
+        'property_insights': (lambda: zillow_storytelling_service.get_property_insights(address), []),
+        'story': (lambda: zillow_storytelling_service.generate_neighborhood_story(address), []),
+        'neighborhood_data': (combine_neighborhood, ['neighborhood', 'story'])
+    })
+
+def _flyer_variants(params):
+    """Distinct (format, template) pairs for a batch render; defaults to every format in the chosen template.
+
+    Raises ValueError for a malformed variant, an unknown format or template, or too many variants.
+    """
+    malformed = 'variants must be a list of {"format", "template"} objects'
+    variants = params['variants']
+    if isinstance(variants, str):
+        try:
+            variants = json.loads(variants)
+        except ValueError:
+            raise ValueError(malformed)
+    if not variants:
+        variants = [{'format': format_type} for format_type in flyer_generator.social_formats]
+    if not isinstance(variants, list):
+        raise ValueError(malformed)
+    
+    pairs = []
+    for variant in variants:
+        if isinstance(variant, dict):
+            pair = (variant.get('format', params['format']), variant.get('template', params['template']))
+        elif isinstance(variant, list) and len(variant) == 2:
+            pair = tuple(variant)
+        else:
+            raise ValueError(malformed)
+        if not all(isinstance(name, str) for name in pair):
+            raise ValueError(malformed)
+        if pair[0] not in flyer_generator.social_formats:
+            raise ValueError(f'Unknown format: {pair[0]}')
+        if pair[1] not in flyer_generator.templates:
+            raise ValueError(f'Unknown template: {pair[1]}')
+        if pair not in pairs:
+            pairs.append(pair)
+    if len(pairs) > MAX_FLYER_VARIANTS:
+        raise ValueError(f'At most {MAX_FLYER_VARIANTS} variants per request')
+    return pairs
 
 @app.route('/')
 def index():
@@ -38,89 +167,154 @@ def index():
 @app.route('/generate-flyer', methods=['POST'])
 def generate_flyer():
     try:
-        # Handle both form data (with file upload) and JSON
-        if request.content_type and 'multipart/form-data' in request.content_type:
-            address = request.form.get('address', 'Beautiful Property')
-            price = request.form.get('price', '0')
-            bedrooms = request.form.get('bedrooms', '0')
-            bathrooms = request.form.get('bathrooms', '0')
-            template = request.form.get('template', 'modern')
-            format_type = request.form.get('format', 'flyer')
-            
-            # Check for uploaded image first, then Zillow image, then fallback
-            uploaded_file = request.files.get('property_image')
-            zillow_image_url = request.form.get('zillow_image_url')
-            
-            if uploaded_file:
-                bg_image = Image.open(uploaded_file)
-            elif zillow_image_url:
-                try:
-                    bg_image = image_service.get_image_from_url(zillow_image_url)
-                except:
-                    property_type = property_service.detect_property_type(price, bedrooms)
-                    image_url = image_service.search_freepik_image(property_type) or image_service.get_fallback_image()
-                    bg_image = image_service.get_image_from_url(image_url)
-            else:
-                # Detect property type and search Freepik
-                property_type = property_service.detect_property_type(price, bedrooms)
-                image_url = image_service.search_freepik_image(property_type) or image_service.get_fallback_image()
-                bg_image = image_service.get_image_from_url(image_url)
+        params, uploaded_file = _read_flyer_request()
+        response_mode = params['response_mode'] or 'json'
+        
+        started = time.perf_counter()
+        results, timings = _gather_flyer_inputs(params, uploaded_file)
+        
+        bg_image = results['background']
+        neighborhood_data = results['neighborhood_data']
+        mortgage_data = results['mortgage']
+        property_insights = results['property_insights']
+        
+        render_started = time.perf_counter()
+        timings['upstream'] = _elapsed_ms(started)
+        # Stored under a hash of the render inputs; identical requests reuse the earlier render
+        artifact = flyer_generator.create_flyer_artifact(
+            bg_image, params['address'], params['price'], params['bedrooms'], params['bathrooms'],
+            params['template'], params['format'], neighborhood_data, mortgage_data, params['output_format']
+        )
+        image_bytes, mimetype = artifact['data'], artifact['mimetype']
+        # Clients get the artifact's name, never its path on this server
+        flyer_name = os.path.basename(artifact['path'])
+        timings['render'] = _elapsed_ms(render_started)
+        timings['render_cache_hit'] = artifact['cache_hit']
+        timings['total'] = _elapsed_ms(started)
+        
+        if response_mode == 'binary':
+            response = Response(image_bytes, mimetype=mimetype)
+            response.headers['X-Flyer-Name'] = flyer_name
+            response.headers['X-Flyer-Timings'] = json.dumps(timings)
+            return response
+        
+        result = {
+            'success': True,
+            'neighborhood': neighborhood_data,
+            'mortgage': mortgage_data,
+            'property_insights': property_insights,
+            'flyer_name': flyer_name,
+            'download_url': f'/download-flyer/{flyer_name}',
+            'timings': timings
+        }
+        
+        if response_mode == 'url':
+            result['image_url'] = f'/flyer-artifact/{flyer_name}'
         else:
-            # Existing JSON handling
-            data = request.json
-            address = data.get('address', 'Beautiful Property')
-            price = data.get('price', '0')
-            bedrooms = data.get('bedrooms', '0')
-            bathrooms = data.get('bathrooms', '0')
-            template = data.get('template', 'modern')
-            format_type = data.get('format', 'flyer')
-            zillow_image_url = data.get('zillow_image_url')
-            
-            # Use Zillow image if available, otherwise fallback to Freepik/Unsplash
-            if zillow_image_url:
-                try:
-                    bg_image = image_service.get_image_from_url(zillow_image_url)
-                except:
-                    property_type = property_service.detect_property_type(price, bedrooms)
-                    image_url = image_service.search_freepik_image(property_type) or image_service.get_fallback_image()
-                    bg_image = image_service.get_image_from_url(image_url)
+            result['image'] = f'data:{mimetype};base64,{base64.b64encode(image_bytes).decode()}'
+        
+        return jsonify(result)
+        
+    except RenderQueueFull as e:
+        print(f"Render queue full: {e}")
+        return _render_busy_response()
+    except ImageDownloadError as e:
+        print(f"Background photo download failed: {e}")
+        return jsonify({'error': 'Could not download a background photo. Please try again or upload a photo.'}), 502
+    except InvalidImageError as e:
+        print(f"Rejected image: {e}")
+        return jsonify({'error': 'The property photo could not be used. Please upload a JPEG, PNG or WebP image.'}), 400
+    except Exception as e:
+        print(f"Error: {e}")
+        return jsonify({'error': 'Failed to generate flyer. Please try again.'}), 500
+
+@app.route('/generate-flyer-batch', methods=['POST'])
+def generate_flyer_batch():
+    """Render several format/template variants of one listing from a single fetch and decode.
+
+    Takes the same fields as /generate-flyer plus `variants`, a list of {"format", "template"} objects
+    (a JSON string in multipart forms), deduplicated and capped at MAX_FLYER_VARIANTS. Variants are returned
+    as artifact URLs unless response_mode is json.
+    """
+    try:
+        params, uploaded_file = _read_flyer_request()
+        response_mode = params['response_mode'] or 'url'
+        try:
+            variants = _flyer_variants(params)
+        except (ValueError, TypeError) as e:
+            return jsonify({'error': str(e)}), 400
+        
+        started = time.perf_counter()
+        results, timings = _gather_flyer_inputs(params, uploaded_file)
+        
+        render_started = time.perf_counter()
+        timings['upstream'] = _elapsed_ms(started)
+        artifacts = flyer_generator.create_flyer_batch(
+            results['background'], variants, params['address'], params['price'], params['bedrooms'], params['bathrooms'],
+            results['neighborhood_data'], results['mortgage'], params['output_format']
+        )
+        timings['render'] = _elapsed_ms(render_started)
+        timings['render_cache_hits'] = sum(1 for artifact in artifacts if artifact['cache_hit'])
+        timings['total'] = _elapsed_ms(started)
+        
+        flyers = []
+        for artifact in artifacts:
+            flyer_name = os.path.basename(artifact['path'])
+            flyer = {
+                'format': artifact['format'],
+                'template': artifact['template'],
+                'flyer_name': flyer_name,
+                'download_url': f'/download-flyer/{flyer_name}',
+                'cache_hit': artifact['cache_hit']
+            }
+            if response_mode == 'json':
+                flyer['image'] = f"data:{artifact['mimetype']};base64,{base64.b64encode(artifact['data']).decode()}"
             else:
-                property_type = property_service.detect_property_type(price, bedrooms)
-                image_url = image_service.search_freepik_image(property_type) or image_service.get_fallback_image()
-                bg_image = image_service.get_image_from_url(image_url)
-        
-        # Get additional data
-        neighborhood_data = maps_service.get_neighborhood_insights(address)
-        mortgage_data = mortgage_service.calculate_mortgage(price)
-        property_insights = zillow_storytelling_service.get_property_insights(address)
-        
-        # Generate AI neighborhood story
-        neighborhood_story = zillow_storytelling_service.generate_neighborhood_story(address)
-        neighborhood_data['story'] = neighborhood_story
-        
-        flyer_path = flyer_generator.create_flyer(bg_image, address, price, bedrooms, bathrooms, template, format_type, neighborhood_data, mortgage_data)
-        
-        with open(flyer_path, 'rb') as img_file:
-            img_base64 = base64.b64encode(img_file.read()).decode()
+                flyer['image_url'] = f'/flyer-artifact/{flyer_name}'
+            flyers.append(flyer)
         
         return jsonify({
             'success': True,
-            'image': f'data:image/png;base64,{img_base64}',
-            'neighborhood': neighborhood_data,
-            'mortgage': mortgage_data,
-            'property_insights': property_insights,
-            'flyer_path': flyer_path
+            'flyers': flyers,
+            'neighborhood': results['neighborhood_data'],
+            'mortgage': results['mortgage'],
+            'property_insights': results['property_insights'],
+            'timings': timings
         })
         
+    except RenderQueueFull as e:
+        print(f"Render queue full: {e}")
+        return _render_busy_response()
+    except ImageDownloadError as e:
+        print(f"Background photo download failed: {e}")
+        return jsonify({'error': 'Could not download a background photo. Please try again or upload a photo.'}), 502
+    except InvalidImageError as e:
+        print(f"Rejected image: {e}")
+        return jsonify({'error': 'The property photo could not be used. Please upload a JPEG, PNG or WebP image.'}), 400
     except Exception as e:
         print(f"Error: {e}")
-        return jsonify({'error': 'Failed to generate flyer. Please try again.'}), 500
+        return jsonify({'error': 'Failed to generate flyers. Please try again.'}), 500
+
 
 
+@app.route('/flyer-layouts')
+def flyer_layouts():
+    """Installed flyer templates (layouts/*.json) and output formats, for the template picker"""
+    return jsonify({
+        'layouts': [{'name': name, 'label': spec.get('label', name.title())} for name, spec in flyer_generator.templates.items()],
+        'formats': list(flyer_generator.social_formats)
+    })
+
+@app.route('/flyer-artifact/<name>')
+def flyer_artifact(name):
+    if not artifact_store.resolve(name):
+        return jsonify({'error': 'Flyer expired or not found'}), 404
+    # Content-addressed, so a given name always refers to the same bytes
+    return send_from_directory(artifact_store.root, name, max_age=3600)
 
 @app.route('/download-flyer/<path:filename>')
 def download_flyer(filename):
-    return send_from_directory('generated', filename, as_attachment=True)
+    return send_from_directory(artifact_store.root, filename, as_attachment=True)
 
 @app.route('/get-social-captions', methods=['POST'])
 def get_social_captions():
@@ -148,7 +342,8 @@ def get_social_captions():
 def email_flyer():
     try:
         data = request.json
-        flyer_path = data.get('flyer_path')
+        # flyer_name as returned by /generate-flyer; flyer_path is still accepted from older clients
+        flyer_path = artifact_store.resolve(data.get('flyer_name') or data.get('flyer_path'))
         recipient_email = data.get('email')
         property_info = {
             'address': data.get('address', 'Beautiful Property'),
@@ -157,6 +352,9 @@ def email_flyer():
             'bathrooms': data.get('bathrooms', '')
         }
         
+        if not flyer_path:
+            return jsonify({'error': 'Flyer not found. Please generate it again.'}), 404
+        
         if social_share_service.is_email_configured():
             result = social_share_service.send_flyer_email(recipient_email, flyer_path, property_info)
             return jsonify(result)
@@ -177,30 +375,72 @@ def get_insights():
         address = data.get('address')
         price = data.get('price')
         
-        neighborhood_data = maps_service.get_neighborhood_insights(address)
-        mortgage_data = mortgage_service.calculate_mortgage(price)
+        results, timings = task_runner.run({
+            'neighborhood': (lambda: maps_service.get_neighborhood_insights(address), []),
+            'mortgage': (lambda: mortgage_service.calculate_mortgage(price), []),
+            'story': (lambda: zillow_storytelling_service.generate_neighborhood_story(address), [])
+        })
         
         # Add AI neighborhood story
-        neighborhood_story = zillow_storytelling_service.generate_neighborhood_story(address)
-        neighborhood_data['story'] = neighborhood_story
+        neighborhood_data = results['neighborhood']
+        neighborhood_data['story'] = results['story']
         
         return jsonify({
             'success': True,
             'neighborhood': neighborhood_data,
-            'mortgage': mortgage_data
+            'mortgage': results['mortgage'],
+            'timings': timings
         })
         
     except Exception as e:
         print(f"Insights error: {e}")
         return jsonify({'error': 'Failed to get insights'}), 500
 
+@app.route('/mortgage-scenarios', methods=['POST'])
+def mortgage_scenarios():
+    """Affordability grid across down payments, rates and terms, plus one scenario's amortization schedule"""
+    try:
+        data = request.json
+        price = data.get('price')
+        if not price:
+            return jsonify({'error': 'Price is required'}), 400
+
+        grid = mortgage_service.scenario_grid(
+            price,
+            data.get('down_payment_percents', [10, 20, 30]),
+            data.get('interest_rates', [5.5, 6.5, 7.5]),
+            data.get('loan_term_years', [15, 30]),
+            data.get('balance_years', [5, 10])
+        )
+        schedule = None
+        if data.get('schedule'):
+            scenario = data['schedule'] if isinstance(data['schedule'], dict) else {}
+            schedule = mortgage_service.amortization_schedule(
+                price,
+                float(scenario.get('down_payment_percent', 20)),
+                float(scenario.get('interest_rate', 6.5)),
+                float(scenario.get('loan_term_years', 30))
+            )
+
+        return jsonify({
+            'success': True,
+            'scenarios': grid,
+            'schedule': schedule
+        })
+
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        print(f"Mortgage scenario error: {e}")
+        return jsonify({'error': 'Failed to calculate mortgage scenarios'}), 500
+
 @app.route('/get-neighborhood-story', methods=['POST'])
 def get_neighborhood_story():
     try:
         data = request.json
         address = data.get('address')
         
-        story = zillow_storytelling_service.generate_neighborhood_story(address)
+        story = zillow_storytelling_service.generate_neighborhood_story(address, regenerate=bool(data.get('regenerate')))
         
         return jsonify({
             'success': True,
@@ -223,26 +463,62 @@ def ai_marketing_agent_endpoint():
         if not property_data:
             return jsonify({'error': 'Property not found'}), 404
         
-        # Get comparables for CMA
-        comparables = zillow_storytelling_service.get_comparable_properties(address)
-        
-        # Generate all AI marketing content
-        descriptions = ai_marketing_agent.generate_property_descriptions(property_data)
-        social_content = ai_marketing_agent.generate_social_media_content(property_data)
-        cma_analysis = ai_marketing_agent.generate_cma_analysis(property_data, comparables)
+        regenerate = bool(data.get('regenerate'))
+        # Unset means the AI_BATCHED_GENERATION default; "false" as a string must not switch batching on
+        batched = data.get('batched')
+        if batched is not None:
+            batched = str(batched).lower() in ('true', '1')
+        
+        # Generate all AI marketing content concurrently; comparables come from the cached property bundle
+        results, timings = task_runner.run({
+            'content': (lambda: ai_marketing_agent.generate_marketing_content(property_data, batched, regenerate), []),
+            'comparables': (lambda: zillow_storytelling_service.get_comparable_properties(address), []),
+            'cma_analysis': (lambda comparables: ai_marketing_agent.generate_cma_analysis(property_data, comparables, regenerate), ['comparables'])
+        })
         
         return jsonify({
             'success': True,
             'property_data': property_data,
-            'descriptions': descriptions,
-            'social_content': social_content,
-            'cma_analysis': cma_analysis
+            'descriptions': results['content'][0],
+            'social_content': results['content'][1],
+            'cma_analysis': results['cma_analysis'],
+            'timings': timings
         })
         
     except Exception as e:
         print(f"AI Marketing Agent error: {e}")
         return jsonify({'error': 'Failed to generate marketing content'}), 500
 
+@app.route('/ai-marketing-agent/stream', methods=['POST'])
+def ai_marketing_agent_stream():
+    """Stream the marketing package as NDJSON events, one section at a time"""
+    data = request.json or {}
+    address = data.get('address')
+    regenerate = bool(data.get('regenerate'))
+    
+    def generate():
+        try:
+            property_data = zillow_storytelling_service.get_property_data(address)
+            if not property_data:
+                yield json.dumps({'type': 'error', 'error': 'Property not found'}) + '\n'
+                return
+            
+            yield json.dumps({'type': 'property_data', 'data': property_data}) + '\n'
+            
+            comparables = zillow_storytelling_service.get_comparable_properties(address)
+            for event in ai_marketing_agent.stream_marketing_content(property_data, comparables, regenerate):
+                yield json.dumps(event) + '\n'
+                
+        except Exception as e:
+            print(f"AI Marketing Agent stream error: {e}")
+            yield json.dumps({'type': 'error', 'error': 'Failed to generate marketing content'}) + '\n'
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/generate-descriptions', methods=['POST'])
 def generate_descriptions():
     try:
@@ -255,7 +531,7 @@ def generate_descriptions():
         if not property_data:
             return jsonify({'error': 'Property not found'}), 404
         
-        descriptions = ai_marketing_agent.generate_property_descriptions(property_data)
+        descriptions = ai_marketing_agent.generate_property_descriptions(property_data, bool(data.get('regenerate')))
         
         return jsonify({
             'success': True,
@@ -278,7 +554,7 @@ def generate_social_content():
         if not property_data:
             return jsonify({'error': 'Property not found'}), 404
         
-        social_content = ai_marketing_agent.generate_social_media_content(property_data)
+        social_content = ai_marketing_agent.generate_social_media_content(property_data, bool(data.get('regenerate')))
         
         return jsonify({
             'success': True,
@@ -302,7 +578,7 @@ def generate_cma():
         if not property_data:
             return jsonify({'error': 'Property not found'}), 404
         
-        cma_analysis = ai_marketing_agent.generate_cma_analysis(property_data, comparables)
+        cma_analysis = ai_marketing_agent.generate_cma_analysis(property_data, comparables, bool(data.get('regenerate')))
         
         return jsonify({
             'success': True,
@@ -372,6 +648,21 @@ def get_property_data():
         print(f"Property data error: {e}")
         return jsonify({'error': 'Failed to get property data'}), 500
 
+@app.route('/stats')
+def stats():
+    return jsonify({
+        'http': http_client.stats(),
+        'zillow_cache': zillow_storytelling_service.cache.stats(),
+        'llm_cache': llm_cache.stats(),
+        'flyer_store': artifact_store.stats(),
+        'render_pool': render_pool.stats(),
+        'geocoder': maps_service.geocoder.stats(),
+        'amenity_index': maps_service.amenities.stats(),
+        'overpass_tiles': maps_service.overpass_tiles.stats(),
+        'fonts': flyer_generator.fonts.report(),
+        'text_layout': flyer_generator.layouts.text_layout.stats()
+    })
+
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
\ No newline at end of file
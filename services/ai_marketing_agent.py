@@ -1,182 +1,448 @@
-import requests
+from services.http_client import http_client
+from services.llm_cache import llm_cache
+from services.cma_engine import CMAEngine
 import os
-from typing import Dict, List
+import json
+import time
+import queue
+import random
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
 
 class AIMarketingAgent:
+    DESCRIPTION_PROMPTS = {
+        'mls': "Write a professional MLS listing description (150-200 words). Focus on key features, location benefits, and selling points. Use real estate industry language.",
+        'luxury': "Write luxury marketing copy emphasizing exclusivity, premium features, and sophisticated lifestyle. Use elegant, upscale language that appeals to affluent buyers.",
+        'family': "Write family-focused copy highlighting safety, schools, community, and family-friendly features. Emphasize comfort, space, and neighborhood benefits for families.",
+        'investment': "Write investment-focused copy emphasizing ROI potential, rental income, market appreciation, and financial benefits. Use data-driven language for investors."
+    }
+    
+    SOCIAL_PROMPTS = {
+        'instagram_post': "Create an engaging Instagram post with emojis and relevant hashtags. Make it visually appealing and shareable. Include call-to-action.",
+        'instagram_story': "Create Instagram story text that's short, engaging, and encourages swipe-ups or DMs. Use casual, friendly tone.",
+        'facebook_post': "Create a Facebook post that tells a story about this property. Make it engaging for homebuyers and include neighborhood benefits.",
+        'linkedin_post': "Create a professional LinkedIn post focusing on market insights, investment potential, and professional real estate analysis."
+    }
+    
     def __init__(self):
         self.openai_api_key = os.getenv('OPENAI_API_KEY')
+        self.max_concurrency = int(os.getenv('OPENAI_MAX_CONCURRENCY', 8))
+        self.max_retries = int(os.getenv('OPENAI_MAX_RETRIES', 3))
+        self.backoff_base = float(os.getenv('OPENAI_BACKOFF_BASE', 1.0))
+        # Longest single wait, and total waiting per completion before a rate limit is reported as an error
+        self.max_backoff = float(os.getenv('OPENAI_MAX_BACKOFF', 20.0))
+        self.retry_budget = float(os.getenv('OPENAI_RETRY_BUDGET', 45.0))
+        self.batched_generation = os.getenv('AI_BATCHED_GENERATION', 'false').lower() == 'true'
         
-    def generate_property_descriptions(self, property_data: Dict) -> Dict[str, str]:
-        """Generate 4 targeted property descriptions"""
+        # Shared across requests so the concurrency limit applies process-wide
+        self.executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='openai')
+        self.cma_engine = CMAEngine()
         
-        base_info = f"""
-        Address: {property_data.get('address', 'N/A')}
-        Price: ${property_data.get('price', 'N/A')}
-        Bedrooms: {property_data.get('bedrooms', 'N/A')}
-        Bathrooms: {property_data.get('bathrooms', 'N/A')}
-        Square Feet: {property_data.get('livingArea', 'N/A')}
-        """
-        
-        descriptions = {}
+    def generate_property_descriptions(self, property_data: Dict, regenerate: bool = False) -> Dict[str, str]:
+        """Generate 4 targeted property descriptions"""
         
-        # MLS Description
-        descriptions['mls'] = self._call_openai(
-            f"{base_info}\nWrite a professional MLS listing description (150-200 words). Focus on key features, location benefits, and selling points. Use real estate industry language."
-        )
+        base_info = self._description_base_info(property_data)
         
-        # Luxury Marketing Copy
-        descriptions['luxury'] = self._call_openai(
-            f"{base_info}\nWrite luxury marketing copy emphasizing exclusivity, premium features, and sophisticated lifestyle. Use elegant, upscale language that appeals to affluent buyers."
-        )
+        return self._run_prompts({
+            style: f"{base_info}\n{instruction}" for style, instruction in self.DESCRIPTION_PROMPTS.items()
+        }, regenerate)
+    
+    def generate_social_media_content(self, property_data: Dict, regenerate: bool = False) -> Dict[str, Dict]:
+        """Generate platform-specific social media content"""
         
-        # Family-Focused Copy
-        descriptions['family'] = self._call_openai(
-            f"{base_info}\nWrite family-focused copy highlighting safety, schools, community, and family-friendly features. Emphasize comfort, space, and neighborhood benefits for families."
-        )
+        base_info = self._social_base_info(property_data)
         
-        # Investment Property Copy
-        descriptions['investment'] = self._call_openai(
-            f"{base_info}\nWrite investment-focused copy emphasizing ROI potential, rental income, market appreciation, and financial benefits. Use data-driven language for investors."
-        )
+        posts = self._run_prompts({
+            name: f"{base_info}\n{instruction}" for name, instruction in self.SOCIAL_PROMPTS.items()
+        }, regenerate)
         
-        return descriptions
+        return self._build_social_content(property_data, posts)
     
-    def generate_social_media_content(self, property_data: Dict) -> Dict[str, Dict]:
-        """Generate platform-specific social media content"""
+    def generate_marketing_content(self, property_data: Dict, batched: bool = None, regenerate: bool = False) -> Tuple[Dict[str, str], Dict[str, Dict]]:
+        """Generate all descriptions and social content, in one structured completion when batched"""
         
-        base_info = f"""
-        Property: {property_data.get('address', 'N/A')}
-        Price: ${property_data.get('price', 'N/A')}
-        Features: {property_data.get('bedrooms', 'N/A')}BR/{property_data.get('bathrooms', 'N/A')}BA
-        """
+        if batched is None:
+            batched = self.batched_generation
         
-        social_content = {}
+        if batched:
+            content = self._call_openai(self._batched_prompt(property_data), max_tokens=2400, json_mode=True, regenerate=regenerate)
+            descriptions, posts = self._parse_batched_content(content)
+        else:
+            descriptions, posts = {}, {}
         
-        # Instagram Content
-        instagram_post = self._call_openai(
-            f"{base_info}\nCreate an engaging Instagram post with emojis and relevant hashtags. Make it visually appealing and shareable. Include call-to-action."
-        )
+        # Any variant missing from the batched reply (or every variant, when not batched) is generated on its own
+        fallback_prompts = {}
+        social_base_info = self._social_base_info(property_data)
+        description_base_info = self._description_base_info(property_data)
+        for style, instruction in self.DESCRIPTION_PROMPTS.items():
+            if style not in descriptions:
+                fallback_prompts[('descriptions', style)] = f"{description_base_info}\n{instruction}"
+        for name, instruction in self.SOCIAL_PROMPTS.items():
+            if name not in posts:
+                fallback_prompts[('social', name)] = f"{social_base_info}\n{instruction}"
         
-        instagram_story = self._call_openai(
-            f"{base_info}\nCreate Instagram story text that's short, engaging, and encourages swipe-ups or DMs. Use casual, friendly tone."
-        )
+        if fallback_prompts:
+            if batched:
+                print(f"Batched generation incomplete, falling back for {len(fallback_prompts)} variant(s)")
+            for (section, name), text in self._run_prompts(fallback_prompts, regenerate).items():
+                (descriptions if section == 'descriptions' else posts)[name] = text
         
-        social_content['instagram'] = {
-            'post': instagram_post,
-            'story': instagram_story,
-            'hashtags': '#JustListed #RealEstate #DreamHome #NewListing #PropertyForSale'
-        }
+        descriptions = {style: descriptions[style] for style in self.DESCRIPTION_PROMPTS}
+        return descriptions, self._build_social_content(property_data, posts)
+    
+    def _batched_prompt(self, property_data: Dict) -> str:
+        description_specs = "\n".join(f'- "{style}": {instruction}' for style, instruction in self.DESCRIPTION_PROMPTS.items())
+        social_specs = "\n".join(f'- "{name}": {instruction}' for name, instruction in self.SOCIAL_PROMPTS.items())
         
-        # Facebook Content
-        facebook_post = self._call_openai(
-            f"{base_info}\nCreate a Facebook post that tells a story about this property. Make it engaging for homebuyers and include neighborhood benefits."
-        )
+        return f"""{self._description_base_info(property_data)}
+Write every piece of marketing copy below for this property.
+
+Descriptions:
+{description_specs}
+
+Social media:
+{social_specs}
+
+Respond with a single JSON object of the form
+{{"descriptions": {{{", ".join(f'"{k}": "..."' for k in self.DESCRIPTION_PROMPTS)}}},
+ "social": {{{", ".join(f'"{k}": "..."' for k in self.SOCIAL_PROMPTS)}}}}}
+Every value must be a non-empty string."""
+    
+    def _parse_batched_content(self, content: str) -> Tuple[Dict[str, str], Dict[str, str]]:
+        """Validate the batched reply against the expected schema, keeping only well-formed variants"""
+        try:
+            data = json.loads(content)
+        except (TypeError, ValueError):
+            return {}, {}
         
-        social_content['facebook'] = {
-            'post': facebook_post,
-            'marketplace': f"{property_data.get('bedrooms', 'N/A')}BR/{property_data.get('bathrooms', 'N/A')}BA - Move-in ready - Great location"
-        }
+        if not isinstance(data, dict):
+            return {}, {}
         
-        # LinkedIn Content
-        linkedin_post = self._call_openai(
-            f"{base_info}\nCreate a professional LinkedIn post focusing on market insights, investment potential, and professional real estate analysis."
-        )
+        def valid_section(section, keys):
+            values = data.get(section)
+            if not isinstance(values, dict):
+                return {}
+            return {
+                key: values[key].strip() for key in keys
+                if isinstance(values.get(key), str) and values[key].strip()
+            }
         
-        social_content['linkedin'] = {
-            'post': linkedin_post
+        return valid_section('descriptions', self.DESCRIPTION_PROMPTS), valid_section('social', self.SOCIAL_PROMPTS)
+    
+    def _description_base_info(self, property_data: Dict) -> str:
+        return f"""
+        Address: {property_data.get('address', 'N/A')}
+        Price: ${property_data.get('price', 'N/A')}
+        Bedrooms: {property_data.get('bedrooms', 'N/A')}
+        Bathrooms: {property_data.get('bathrooms', 'N/A')}
+        Square Feet: {property_data.get('livingArea', 'N/A')}
+        """
+    
+    def _social_base_info(self, property_data: Dict) -> str:
+        return f"""
+        Property: {property_data.get('address', 'N/A')}
+        Price: ${property_data.get('price', 'N/A')}
+        Features: {property_data.get('bedrooms', 'N/A')}BR/{property_data.get('bathrooms', 'N/A')}BA
+        """
+    
+    def _build_social_content(self, property_data: Dict, posts: Dict[str, str]) -> Dict[str, Dict]:
+        return {
+            'instagram': {
+                'post': posts['instagram_post'],
+                'story': posts['instagram_story'],
+                'hashtags': '#JustListed #RealEstate #DreamHome #NewListing #PropertyForSale'
+            },
+            'facebook': {
+                'post': posts['facebook_post'],
+                'marketplace': f"{property_data.get('bedrooms', 'N/A')}BR/{property_data.get('bathrooms', 'N/A')}BA - Move-in ready - Great location"
+            },
+            'linkedin': {
+                'post': posts['linkedin_post']
+            }
         }
-        
-        return social_content
     
-    def generate_cma_analysis(self, property_data: Dict, comparables: List[Dict]) -> Dict:
-        """Generate Comparative Market Analysis"""
+    def _run_prompts(self, prompts: Dict[str, str], regenerate: bool = False) -> Dict[str, str]:
+        """Run several completions concurrently, bounded by the shared OpenAI worker pool"""
+        futures = {
+            name: self.executor.submit(self._call_openai, prompt, regenerate=regenerate)
+            for name, prompt in prompts.items()
+        }
+        return {name: future.result() for name, future in futures.items()}
+    
+    def generate_cma_analysis(self, property_data: Dict, comparables: List[Dict], regenerate: bool = False) -> Dict:
+        """Generate Comparative Market Analysis: valued by the CMA engine, narrated by the LLM"""
         
-        if not comparables:
+        valuation = self.cma_engine.evaluate(property_data, comparables)
+        if not valuation:
             return {'error': 'No comparable properties found'}
         
-        # Format comparables for analysis
+        analysis_future = self.executor.submit(self._call_openai, self._cma_prompt(property_data, valuation), regenerate=regenerate)
+        
+        return self._build_cma_analysis(property_data, valuation, analysis_future.result())
+    
+    def _cma_prompt(self, property_data: Dict, valuation: Dict) -> str:
+        # Every figure is computed already; the model only explains them
         comp_summary = "\n".join([
-            f"- {comp.get('address', 'N/A')}: ${comp.get('price', 'N/A')} | {comp.get('bedrooms', 'N/A')}BR/{comp.get('bathrooms', 'N/A')}BA | {comp.get('livingArea', 'N/A')} sqft"
-            for comp in comparables[:5]
+            f"- {comp.get('address', 'N/A')}: sold/listed ${comp.get('price', 'N/A')} | {comp.get('bedrooms', 'N/A')}BR/{comp.get('bathrooms', 'N/A')}BA | "
+            f"{comp.get('livingArea', 'N/A')} sqft | {comp['distance_km'] if comp['distance_km'] is not None else 'unknown'} km away | "
+            f"{'sale date unknown' if comp['months_since_sale'] is None else 'sold %s months ago' % comp['months_since_sale']} | "
+            f"adjustments {', '.join(f'{name} {amount:+,}' for name, amount in comp['adjustments'].items() if amount)} | adjusted ${comp['adjusted_price']:,}"
+            for comp in valuation['comps']
         ])
         
-        prompt = f"""
-        Subject Property: {property_data.get('address', 'N/A')} - ${property_data.get('price', 'N/A')}
+        return f"""
+        Subject Property: {property_data.get('address', 'N/A')} - listed at ${property_data.get('price', 'N/A')} | {property_data.get('bedrooms', 'N/A')}BR/{property_data.get('bathrooms', 'N/A')}BA | {property_data.get('livingArea', 'N/A')} sqft
         
-        Comparable Sales:
+        Comparable Sales (selected from {valuation['candidates_considered']} candidates, most similar first):
         {comp_summary}
         
-        Generate a professional CMA analysis including:
-        1. Market position assessment
-        2. Price per square foot analysis  
-        3. Competitive advantages/disadvantages
-        4. Pricing recommendation
-        5. Days on market prediction
+        Computed valuation:
+        - Estimated value: ${valuation['estimate']:,.0f} (range ${valuation['low']:,.0f} - ${valuation['high']:,.0f}, {valuation['confidence']} confidence)
+        - Value per square foot: ${valuation['price_per_sqft']} (comps average ${valuation['market_price_per_sqft']})
+        - {self._recency_note(valuation)}
         
-        Format as a structured report suitable for client presentation.
-        """
+        Write a professional CMA narrative for a client presentation covering:
+        1. Market position of the list price against the valuation range
+        2. Price per square foot analysis
+        3. What the adjustments say about the subject's advantages/disadvantages
+        4. Pricing recommendation within the valuation range
         
-        analysis = self._call_openai(prompt)
-        
-        # Calculate basic metrics
+        Use only the figures above; do not introduce other numbers or estimates.
+        """
+    
+    @staticmethod
+    def _recency_note(valuation: Dict) -> str:
+        known, total = valuation['sale_dates_known'], len(valuation['comps'])
+        if known == total:
+            return 'Sale dates known for all comps; older sales are adjusted for market movement.'
+        if not known:
+            return 'Sale dates were not available for these comps (they may be active listings), so recency was not weighed and no market-time adjustment was made.'
+        return f'Sale dates known for {known} of {total} comps; the others were not weighed for recency or adjusted for market movement.'
+    
+    def _build_cma_analysis(self, property_data: Dict, valuation: Dict, analysis: str) -> Dict:
         try:
-            subject_sqft = float(property_data.get('livingArea', 0))
-            subject_price = float(property_data.get('price', 0))
-            
-            if subject_sqft > 0:
-                price_per_sqft = subject_price / subject_sqft
-            else:
-                price_per_sqft = 0
-                
-            # Calculate average comp price per sqft
-            comp_prices_per_sqft = []
-            for comp in comparables[:3]:
-                comp_sqft = float(comp.get('livingArea', 0))
-                comp_price = float(comp.get('price', 0))
-                if comp_sqft > 0:
-                    comp_prices_per_sqft.append(comp_price / comp_sqft)
-            
-            avg_comp_price_per_sqft = sum(comp_prices_per_sqft) / len(comp_prices_per_sqft) if comp_prices_per_sqft else 0
-            
+            list_price = float(str(property_data.get('price', 0)).replace(',', '').replace('$', ''))
         except (ValueError, TypeError):
-            price_per_sqft = 0
-            avg_comp_price_per_sqft = 0
+            list_price = 0
+        
+        if not list_price:
+            position = 'No list price'
+        elif list_price > valuation['high']:
+            position = 'Above market'
+        elif list_price < valuation['low']:
+            position = 'Below market'
+        else:
+            position = 'Within market range'
         
         return {
             'subject_property': property_data,
-            'comparables': comparables[:5],
+            'comparables': valuation['comps'],
+            'valuation': {**{key: value for key, value in valuation.items() if key != 'comps'}, 'recency_note': self._recency_note(valuation)},
             'analysis': analysis,
             'metrics': {
-                'price_per_sqft': f'${price_per_sqft:.0f}',
-                'market_average': f'${avg_comp_price_per_sqft:.0f}',
-                'position': 'Above market' if price_per_sqft > avg_comp_price_per_sqft else 'Below market'
+                'estimated_value': f"${valuation['estimate']:,.0f}",
+                'value_range': f"${valuation['low']:,.0f} - ${valuation['high']:,.0f}",
+                'confidence': valuation['confidence'],
+                'price_per_sqft': f"${valuation['price_per_sqft']:.0f}",
+                'market_average': f"${valuation['market_price_per_sqft']:.0f}",
+                'position': position
             }
         }
     
-    def _call_openai(self, prompt: str) -> str:
-        """Make OpenAI API call with error handling"""
-        try:
-            response = requests.post(
-                'https://api.openai.com/v1/chat/completions',
-                headers={
-                    'Authorization': f'Bearer {self.openai_api_key}',
-                    'Content-Type': 'application/json'
-                },
-                json={
-                    'model': 'gpt-3.5-turbo',
-                    'messages': [
-                        {'role': 'system', 'content': 'You are a professional real estate marketing expert and agent.'},
-                        {'role': 'user', 'content': prompt}
-                    ],
-                    'max_tokens': 400,
-                    'temperature': 0.7
-                }
-            )
+    def stream_marketing_content(self, property_data: Dict, comparables: List[Dict], regenerate: bool = False) -> Iterator[Dict]:
+        """Yield events as completions stream in: token deltas, each finished variant, the CMA, then a summary.
+
+        Every variant runs as its own streamed completion on the shared worker pool, so the first
+        tokens arrive as soon as any completion starts producing them.
+        """
+        events = queue.Queue()
+        description_base_info = self._description_base_info(property_data)
+        social_base_info = self._social_base_info(property_data)
+        
+        jobs = [('descriptions', style, f"{description_base_info}\n{instruction}") for style, instruction in self.DESCRIPTION_PROMPTS.items()]
+        jobs += [('social', name, f"{social_base_info}\n{instruction}") for name, instruction in self.SOCIAL_PROMPTS.items()]
+        valuation = self.cma_engine.evaluate(property_data, comparables)
+        if valuation:
+            jobs.append(('cma', 'analysis', self._cma_prompt(property_data, valuation)))
+        
+        def run(section, key, prompt):
+            content = None
+            try:
+                content = self._stream_openai(
+                    prompt,
+                    lambda text: events.put({'type': 'delta', 'section': section, 'key': key, 'text': text}),
+                    regenerate=regenerate
+                )
+            except Exception as e:
+                content = f"Error: {str(e)}"
+            finally:
+                events.put({'type': 'done', 'section': section, 'key': key, 'content': content})
+        
+        for section, key, prompt in jobs:
+            self.executor.submit(run, section, key, prompt)
+        
+        descriptions, posts = {}, {}
+        remaining = len(jobs)
+        while remaining:
+            event = events.get()
+            yield event
+            if event['type'] != 'done':
+                continue
             
-            if response.status_code == 200:
-                return response.json()['choices'][0]['message']['content'].strip()
+            remaining -= 1
+            if event['section'] == 'descriptions':
+                descriptions[event['key']] = event['content']
+            elif event['section'] == 'social':
+                posts[event['key']] = event['content']
+                if len(posts) == len(self.SOCIAL_PROMPTS):
+                    yield {'type': 'social_content', 'data': self._build_social_content(property_data, posts)}
             else:
+                yield {'type': 'cma_analysis', 'data': self._build_cma_analysis(property_data, valuation, event['content'])}
+        
+        if not valuation:
+            yield {'type': 'cma_analysis', 'data': {'error': 'No comparable properties found'}}
+        
+        yield {
+            'type': 'complete',
+            'descriptions': {style: descriptions[style] for style in self.DESCRIPTION_PROMPTS},
+            'social_content': self._build_social_content(property_data, posts)
+        }
+    
+    def _call_openai(self, prompt: str, max_tokens: int = 400, json_mode: bool = False, regenerate: bool = False) -> str:
+        """Make OpenAI API call with error handling, backing off on rate limits and server errors.
+
+        Successful completions are cached by request content; `regenerate` skips the cache lookup
+        and replaces the stored answer.
+        """
+        payload = self._completion_payload(prompt, max_tokens, json_mode)
+        
+        cache_key = llm_cache.make_key(payload['model'], payload['messages'], payload['temperature'], max_tokens, json_mode=json_mode)
+        if not regenerate:
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        deadline = time.monotonic() + self.retry_budget
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self._post_completion(payload)
+                if response.status_code == 200:
+                    content = response.json()['choices'][0]['message']['content'].strip()
+                    llm_cache.set(cache_key, content)
+                    return content
+            except Exception as e:
+                return f"Error: {str(e)}"
+            
+            if response.status_code in (429, 500, 502, 503, 504) and attempt < self.max_retries:
+                delay = self._retry_delay(response, attempt, deadline)
+                if delay is not None:
+                    time.sleep(delay)
+                    continue
+            
+            return f"Error generating content: {response.status_code}"
+    
+    def _stream_openai(self, prompt: str, on_delta: Callable[[str], None], max_tokens: int = 400, regenerate: bool = False) -> str:
+        """Stream a completion, passing each token delta to `on_delta`, and return the full text.
+
+        Cached answers are replayed as a single delta. Rate limits are retried only before any
+        tokens have been delivered.
+        """
+        payload = self._completion_payload(prompt, max_tokens, False)
+        cache_key = llm_cache.make_key(payload['model'], payload['messages'], payload['temperature'], max_tokens, json_mode=False)
+        if not regenerate:
+            cached = llm_cache.get(cache_key)
+            if cached is not None:
+                on_delta(cached)
+                return cached
+        
+        payload['stream'] = True
+        deadline = time.monotonic() + self.retry_budget
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self._post_completion(payload, stream=True)
+            except Exception as e:
+                return f"Error: {str(e)}"
+            
+            if response.status_code in (429, 500, 502, 503, 504) and attempt < self.max_retries:
+                response.close()
+                delay = self._retry_delay(response, attempt, deadline)
+                if delay is not None:
+                    time.sleep(delay)
+                    continue
+            
+            if response.status_code != 200:
+                response.close()
                 return f"Error generating content: {response.status_code}"
-                
-        except Exception as e:
-            return f"Error: {str(e)}"
\ No newline at end of file
+            
+            parts, finish_reason, done = [], None, False
+            with response:
+                # Lines are split on raw bytes and decoded whole, so multi-byte characters are never cut;
+                # requests would otherwise guess the charset of a text/event-stream without one
+                for raw_line in response.iter_lines():
+                    line = raw_line.decode('utf-8')
+                    if not line.startswith('data: '):
+                        continue
+                    data = line[len('data: '):]
+                    if data == '[DONE]':
+                        done = True
+                        break
+                    try:
+                        choice = json.loads(data)['choices'][0]
+                        delta = choice['delta'].get('content')
+                    except (ValueError, KeyError, IndexError):
+                        continue
+                    finish_reason = choice.get('finish_reason') or finish_reason
+                    if delta:
+                        # Match _call_openai, which strips the finished text
+                        if not parts:
+                            delta = delta.lstrip()
+                            if not delta:
+                                continue
+                        parts.append(delta)
+                        on_delta(delta)
+            
+            content = ''.join(parts).strip()
+            # A dropped connection or a completion cut at max_tokens is shown but not cached
+            if done and finish_reason == 'stop':
+                llm_cache.set(cache_key, content)
+            return content
+    
+    def _retry_delay(self, response, attempt: int, deadline: float) -> Optional[float]:
+        """Seconds to wait before retrying, or None to give up.
+
+        Honors Retry-After when OpenAI sends it, otherwise exponential backoff with jitter; waits are
+        capped at max_backoff. A wait that would run past the retry budget gives up instead, since a
+        server asking for a longer pause would only reject an early retry again.
+        """
+        try:
+            delay = max(float(response.headers.get('Retry-After')), 0.0)
+        except (TypeError, ValueError):
+            delay = self.backoff_base * (2 ** attempt) + random.uniform(0, self.backoff_base)
+        if delay > deadline - time.monotonic():
+            return None
+        return min(delay, self.max_backoff)
+    
+    def _completion_payload(self, prompt: str, max_tokens: int, json_mode: bool) -> Dict:
+        payload = {
+            'model': 'gpt-3.5-turbo',
+            'messages': [
+                {'role': 'system', 'content': 'You are a professional real estate marketing expert and agent.'},
+                {'role': 'user', 'content': prompt}
+            ],
+            'max_tokens': max_tokens,
+            'temperature': 0.7
+        }
+        if json_mode:
+            payload['response_format'] = {'type': 'json_object'}
+        return payload
+    
+    def _post_completion(self, payload: Dict, stream: bool = False):
+        return http_client.post(
+            'https://api.openai.com/v1/chat/completions',
+            headers={
+                'Authorization': f'Bearer {self.openai_api_key}',
+                'Content-Type': 'application/json'
+            },
+            json=payload,
+            stream=stream
+        )
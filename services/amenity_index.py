@@ -0,0 +1,145 @@
+import os
+import csv
+import json
+import math
+from collections import defaultdict
+
+
+EARTH_RADIUS_M = 6371000
+METERS_PER_DEGREE = 111320
+
+
+class AmenityIndex:
+    """Schools, restaurants and parks from a local point file, bucketed into a lat/lon grid.
+
+    A radius query only visits the grid cells the circle overlaps, so neighborhood counts are answered
+    in memory instead of by an Overpass request. The file is either a CSV with kind, name, lat and lon
+    columns, or an OSM JSON extract as exported by Overpass ({"elements": [...]} with tags).
+    """
+
+    KINDS = ('school', 'restaurant', 'park')
+    # OSM tag -> value -> kind
+    OSM_TAGS = {'amenity': {'school': 'school', 'restaurant': 'restaurant'}, 'leisure': {'park': 'park'}}
+
+    def __init__(self, path=None, cell_meters=None, points=None):
+        """Index the point file at path (default AMENITY_POINTS), or the given (kind, lat, lon, name) points"""
+        self.path = path or (os.getenv('AMENITY_POINTS') if points is None else None)
+        self.cell_degrees = (cell_meters or float(os.getenv('AMENITY_CELL_METERS', 1000))) / METERS_PER_DEGREE
+        # (row, col) -> kind -> [(lat, lon, cos(lat), name)]
+        self.cells = defaultdict(lambda: defaultdict(list))
+        self.points = 0
+
+        if self.path:
+            self._load(self.path)
+        for point in points or ():
+            self.add(*point)
+
+    @property
+    def enabled(self):
+        return self.points > 0
+
+    def covers(self, lat, lon, radius=2000):
+        """Whether the loaded points include any cell the radius query would visit.
+
+        Coverage is per cell rather than the extract's bounding box, so a location between two regions
+        of a multi-region file (or in a gap of a sparse one) falls back to Overpass instead of reading
+        as "no amenities nearby".
+        """
+        return any(cell in self.cells for cell in self._cells_around(lat, lon, radius))
+
+    def add(self, kind, lat, lon, name=None):
+        self.cells[self._cell(lat, lon)][kind].append((lat, lon, math.cos(math.radians(lat)), name or None))
+        self.points += 1
+
+    def nearby(self, lat, lon, radius=2000):
+        """Counts per kind within radius meters, and the nearest named school (or None)"""
+        counts, nearest_school, _ = self.nearby_with_distance(lat, lon, radius)
+        return counts, nearest_school
+
+    def nearby_with_distance(self, lat, lon, radius=2000):
+        """Like nearby(), plus the nearest named school's distance in meters (None without one)"""
+        counts = dict.fromkeys(self.KINDS, 0)
+        nearest_school, nearest_distance = None, None
+        # Haversine terms compared against the radius' own, so no square root or arcsine per point
+        lon_scale = math.cos(math.radians(lat))
+        limit = math.sin(radius / EARTH_RADIUS_M / 2) ** 2
+
+        for cell_key in self._cells_around(lat, lon, radius):
+            cell = self.cells.get(cell_key)
+            if not cell:
+                continue
+            for kind, points in cell.items():
+                for point_lat, point_lon, point_cos, name in points:
+                    distance = math.sin(math.radians(point_lat - lat) / 2) ** 2 + lon_scale * point_cos * math.sin(math.radians(point_lon - lon) / 2) ** 2
+                    if distance > limit:
+                        continue
+                    counts[kind] += 1
+                    if kind == 'school' and name and (nearest_distance is None or distance < nearest_distance):
+                        nearest_school, nearest_distance = name, distance
+        if nearest_distance is not None:
+            nearest_distance = 2 * EARTH_RADIUS_M * math.asin(math.sqrt(nearest_distance))
+        return counts, nearest_school, nearest_distance
+
+    def stats(self):
+        return {'path': self.path, 'points': self.points, 'cells': len(self.cells)}
+
+    def estimated_bytes(self):
+        """Rough memory footprint, for size-bounded caches holding indexes"""
+        return self.points * 120 + len(self.cells) * 200
+
+    def _cell(self, lat, lon):
+        return (math.floor(lat / self.cell_degrees), math.floor(lon / self.cell_degrees))
+
+    def _cells_around(self, lat, lon, radius):
+        """Grid cells a circle of radius meters around the point can overlap"""
+        row, col = self._cell(lat, lon)
+        row_span = math.ceil(radius / METERS_PER_DEGREE / self.cell_degrees)
+        col_span = math.ceil(radius / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01)) / self.cell_degrees)
+        for r in range(row - row_span, row + row_span + 1):
+            for c in range(col - col_span, col + col_span + 1):
+                yield (r, c)
+
+    def _load(self, path):
+        try:
+            if path.endswith('.json'):
+                with open(path, encoding='utf-8') as f:
+                    elements = json.load(f).get('elements', [])
+                for element in elements:
+                    self._add_osm_element(element)
+            else:
+                with open(path, newline='', encoding='utf-8') as f:
+                    for row in csv.DictReader(f):
+                        self._add_csv_row({name.strip().lower(): value for name, value in row.items() if name})
+        except (OSError, ValueError, csv.Error) as e:
+            print(f"Amenity index not loaded ({path}): {e}")
+            self.cells.clear()
+            self.points = 0
+            return
+        print(f"Amenity index: {self.points} points from {path}")
+
+    def _add_csv_row(self, row):
+        kind = (row.get('kind') or row.get('category') or '').strip().lower()
+        if kind not in self.KINDS:
+            return
+        try:
+            self.add(kind, float(row.get('lat') or row.get('latitude')), float(row.get('lon') or row.get('lng') or row.get('longitude')), row.get('name'))
+        except (TypeError, ValueError):
+            pass
+
+    def _add_osm_element(self, element):
+        tags = element.get('tags', {})
+        kind = next((kinds[tags[tag]] for tag, kinds in self.OSM_TAGS.items() if tags.get(tag) in kinds), None)
+        if not kind:
+            return
+        # Nodes have lat/lon; ways and relations have a center ("out center") or geometry ("out geom")
+        if 'lat' in element:
+            lat, lon = element['lat'], element['lon']
+        elif 'center' in element:
+            lat, lon = element['center']['lat'], element['center']['lon']
+        elif element.get('geometry'):
+            geometry = element['geometry']
+            lat = sum(p['lat'] for p in geometry) / len(geometry)
+            lon = sum(p['lon'] for p in geometry) / len(geometry)
+        else:
+            return
+        self.add(kind, float(lat), float(lon), tags.get('name'))
@@ -0,0 +1,110 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+
+
+class ArtifactStore:
+    def __init__(self, root=None, max_bytes=None, max_age=None, gc_interval=60):
+        self.root = os.path.abspath(root or os.getenv('FLYER_STORE_DIR', 'generated'))
+        self.max_bytes = max_bytes or int(os.getenv('FLYER_STORE_MAX_BYTES', 500 * 1024 * 1024))
+        self.max_age = max_age or int(os.getenv('FLYER_STORE_MAX_AGE', 7 * 24 * 3600))
+        self.gc_interval = gc_interval
+        self._gc_lock = threading.Lock()
+        self._last_gc = 0
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.root, exist_ok=True)
+
+    @staticmethod
+    def make_key(*parts):
+        """Content address for a set of render inputs"""
+        payload = json.dumps(parts, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def path_for(self, key, extension):
+        return os.path.join(self.root, f'{key}.{extension}')
+
+    def get(self, key, extension):
+        """Path of a stored artifact, or None. Hits refresh the file's age for garbage collection."""
+        path = self.path_for(key, extension)
+        try:
+            os.utime(path)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def put(self, key, extension, data):
+        """Store bytes atomically (write to a temp file, then rename) and return the artifact path"""
+        path = self.path_for(key, extension)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        if time.time() - self._last_gc > self.gc_interval:
+            self.collect_garbage()
+        return path
+
+    def resolve(self, name):
+        """Map a client-supplied artifact name or path to a file inside the store, or None"""
+        if not name:
+            return None
+        path = os.path.join(self.root, os.path.basename(name))
+        return path if os.path.isfile(path) else None
+
+    def collect_garbage(self):
+        """Remove artifacts older than max_age, then the least recently used until under max_bytes"""
+        if not self._gc_lock.acquire(blocking=False):
+            return 0
+
+        try:
+            self._last_gc = time.time()
+            artifacts = []
+            for entry in os.scandir(self.root):
+                if not entry.is_file() or entry.name.startswith('.tmp-'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                artifacts.append((stat.st_mtime, stat.st_size, entry.path))
+
+            removed = 0
+            total = sum(size for _, size, _ in artifacts)
+            cutoff = self._last_gc - self.max_age
+            for mtime, size, path in sorted(artifacts):
+                if mtime >= cutoff and total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    removed += 1
+                    total -= size
+                except OSError:
+                    pass
+            return removed
+        finally:
+            self._gc_lock.release()
+
+    def stats(self):
+        entries, size = 0, 0
+        for entry in os.scandir(self.root):
+            if entry.is_file():
+                entries += 1
+                size += entry.stat().st_size
+        return {
+            'root': self.root,
+            'entries': entries,
+            'bytes': size,
+            'hits': self.hits,
+            'misses': self.misses
+        }
@@ -1,5 +1,5 @@
 import os
-import requests
+from services.http_client import http_client
 import base64
 
 class BufferService:
@@ -10,7 +10,7 @@ class BufferService:
     def get_profiles(self):
         """Get user's social media profiles"""
         try:
-            response = requests.get(
+            response = http_client.get(
                 f'{self.base_url}/profiles.json',
                 params={'access_token': self.access_token}
             )
@@ -26,7 +26,7 @@ class BufferService:
                 files = {'media': image_file}
                 data = {'access_token': self.access_token}
                 
-                response = requests.post(
+                response = http_client.post(
                     f'{self.base_url}/updates/create.json',
                     files=files,
                     data=data
@@ -56,7 +56,7 @@ class BufferService:
                 'now': True  # Post immediately
             }
             
-            response = requests.post(
+            response = http_client.post(
                 f'{self.base_url}/updates/create.json',
                 data=data
             )
@@ -85,7 +85,7 @@ class BufferService:
                 'scheduled_at': schedule_time  # Unix timestamp
             }
             
-            response = requests.post(
+            response = http_client.post(
                 f'{self.base_url}/updates/create.json',
                 data=data
             )
@@ -99,7 +99,7 @@ class BufferService:
     def get_analytics(self, profile_id):
         """Get analytics for a profile"""
         try:
-            response = requests.get(
+            response = http_client.get(
                 f'{self.base_url}/profiles/{profile_id}/updates.json',
                 params={'access_token': self.access_token}
             )
@@ -0,0 +1,131 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+def normalize_address(address):
+    """Normalize an address into a stable cache key (case, punctuation and whitespace insensitive)"""
+    address = str(address or '').lower()
+    address = re.sub(r'[.,#]', ' ', address)
+    return re.sub(r'\s+', ' ', address).strip()
+
+
+class TTLCache:
+    def __init__(self, max_entries=1000, max_bytes=50 * 1024 * 1024, default_ttl=3600):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """Return the cached value, refreshing its LRU position, or `default` if missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at, size = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        size = self._estimate_size(value)
+        if size > self.max_bytes:
+            return
+
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.default_ttl)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires_at, size)
+            self._bytes += size
+
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def get_or_set(self, key, factory, ttl=None):
+        """Return the cached value, or compute it with `factory` and cache it unless it is None.
+
+        Concurrent misses on the same key wait for a single `factory` call instead of each running it.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        with self._lock:
+            key_lock = self._inflight.setdefault(key, threading.Lock())
+
+        with key_lock:
+            try:
+                value = self._peek(key)
+                if value is None:
+                    value = factory()
+                    if value is not None:
+                        self.set(key, value, ttl)
+            finally:
+                with self._lock:
+                    if self._inflight.get(key) is key_lock:
+                        del self._inflight[key]
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0
+            }
+
+    def _peek(self, key):
+        """Like get() but without touching the hit/miss counters"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.monotonic():
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def _remove(self, key):
+        _, _, size = self._entries.pop(key)
+        self._bytes -= size
+
+    @staticmethod
+    def _estimate_size(value):
+        if isinstance(value, (bytes, bytearray)):
+            return len(value)
+        if hasattr(value, 'getbands') and hasattr(value, 'size'):
+            # Decoded PIL image: the pixel buffer dominates
+            width, height = value.size
+            return width * height * len(value.getbands())
+        if hasattr(value, 'estimated_bytes'):
+            return value.estimated_bytes()
+        try:
+            return len(json.dumps(value, default=str))
+        except (TypeError, ValueError):
+            return len(repr(value))
@@ -0,0 +1,197 @@
+import os
+import math
+import time
+from datetime import datetime
+import numpy as np
+
+
+EARTH_RADIUS_KM = 6371.0
+
+
+class CMAEngine:
+    """Deterministic comparative market analysis: comp selection, adjustments and a valuation range.
+
+    Candidates with implausible prices or living areas, and price-per-square-foot outliers, are dropped
+    first. Every remaining candidate is scored in one vectorized pass on distance, bedroom and bathroom
+    differences, living-area ratio and sale recency, so thousands of candidates cost about as much as
+    a handful.
+    The best-scoring comps are adjusted to the subject (size, rooms, market movement since the sale)
+    and combined into a similarity-weighted estimate with a range.
+    """
+
+    # Penalty per unit of difference; similarity = exp(-sum of penalties)
+    WEIGHTS = {
+        'distance_km': 0.5,
+        'bedrooms': 0.35,
+        'bathrooms': 0.25,
+        'sqft_log_ratio': 4.0,
+        'months_since_sale': 0.05
+    }
+    # Sold date assumed for candidates without one (active listings, missing data)
+    UNKNOWN_SALE_MONTHS = 6
+    # Difference assumed when a term is unknown on either side: a middling mismatch, so missing data is
+    # neither a perfect match nor a disqualification
+    UNKNOWN_DIFFERENCES = {'distance_km': 2.0, 'bedrooms': 1.0, 'bathrooms': 1.0, 'sqft_log_ratio': 0.2}
+    # Candidates outside these are data errors (placeholder prices, lot size in the living area field)
+    MIN_PRICE = 10000
+    LIVING_AREA_RANGE = (200, 50000)
+    # Price per square foot more than this factor from the candidates' median, or outside
+    # [Q1 - k*IQR, Q3 + k*IQR] once there are enough candidates for quartiles, is dropped as an outlier
+    PPSF_MEDIAN_FACTOR = 3.0
+    PPSF_IQR_FACTOR = 1.5
+
+    def __init__(self, max_comps=None, monthly_appreciation=None, sqft_adjustment_share=None, bedroom_value_share=None, bathroom_value_share=None):
+        self.max_comps = max_comps or int(os.getenv('CMA_MAX_COMPS', 6))
+        # Market movement per month, applied to bring older sales to today's prices
+        self.monthly_appreciation = monthly_appreciation if monthly_appreciation is not None else float(os.getenv('CMA_MONTHLY_APPRECIATION', 0.003))
+        # Marginal value of a square foot, as a share of the comps' median price per square foot
+        self.sqft_adjustment_share = sqft_adjustment_share if sqft_adjustment_share is not None else float(os.getenv('CMA_SQFT_ADJUSTMENT_SHARE', 0.5))
+        # Value of a bedroom / bathroom, as a share of the comps' median price
+        self.bedroom_value_share = bedroom_value_share if bedroom_value_share is not None else float(os.getenv('CMA_BEDROOM_VALUE_SHARE', 0.03))
+        self.bathroom_value_share = bathroom_value_share if bathroom_value_share is not None else float(os.getenv('CMA_BATHROOM_VALUE_SHARE', 0.02))
+
+    def evaluate(self, subject, candidates, now=None):
+        """Valuation of subject from candidate comps, or None if no candidate has a price and living area"""
+        now = now or time.time()
+        comps = self._plausible(candidates)
+        if not comps:
+            return None
+
+        price = np.array([self._number(c.get('price')) for c in comps])
+        sqft = np.array([self._number(c.get('livingArea')) for c in comps])
+        beds = np.array([self._positive(c.get('bedrooms')) for c in comps])
+        baths = np.array([self._positive(c.get('bathrooms')) for c in comps])
+        lat = np.array([self._number(c.get('latitude'), np.nan) for c in comps])
+        lon = np.array([self._number(c.get('longitude'), np.nan) for c in comps])
+        sold_at = np.array([self._timestamp(c.get('dateSold')) for c in comps])
+
+        subject_sqft = self._positive(subject.get('livingArea'))
+        subject_beds = self._positive(subject.get('bedrooms'))
+        subject_baths = self._positive(subject.get('bathrooms'))
+        subject_lat = self._number(subject.get('latitude'), np.nan)
+        subject_lon = self._number(subject.get('longitude'), np.nan)
+
+        months = np.where(np.isnan(sold_at), self.UNKNOWN_SALE_MONTHS, np.clip((now - sold_at) / (30.44 * 86400), 0, None))
+        distance = self._haversine_km(subject_lat, subject_lon, lat, lon)
+        bed_diff = subject_beds - beds
+        bath_diff = subject_baths - baths
+        sqft_log_ratio = np.log(subject_sqft / sqft)
+
+        differences = {
+            'distance_km': distance,
+            'bedrooms': np.abs(bed_diff),
+            'bathrooms': np.abs(bath_diff),
+            'sqft_log_ratio': np.abs(sqft_log_ratio)
+        }
+        penalty = self.WEIGHTS['months_since_sale'] * months
+        for name, difference in differences.items():
+            penalty = penalty + self.WEIGHTS[name] * np.where(np.isnan(difference), self.UNKNOWN_DIFFERENCES[name], difference)
+        similarity = np.exp(-penalty)
+
+        # Top comps by similarity, without sorting every candidate
+        k = min(self.max_comps, len(comps))
+        top = np.argpartition(-similarity, k - 1)[:k]
+        top = top[np.argsort(-similarity[top])]
+
+        median_price = float(np.median(price[top]))
+        median_ppsf = float(np.median(price[top] / sqft[top]))
+        adjustments = {
+            'time': np.where(np.isnan(sold_at), 0, price * ((1 + self.monthly_appreciation) ** months - 1)),
+            'size': np.nan_to_num((subject_sqft - sqft) * median_ppsf * self.sqft_adjustment_share),
+            'bedrooms': np.nan_to_num(bed_diff * median_price * self.bedroom_value_share),
+            'bathrooms': np.nan_to_num(bath_diff * median_price * self.bathroom_value_share)
+        }
+        adjusted = price + sum(adjustments.values())
+
+        weights = similarity[top] / similarity[top].sum()
+        estimate = float(np.dot(weights, adjusted[top]))
+        spread = float(np.sqrt(np.dot(weights, (adjusted[top] - estimate) ** 2)))
+        # A range never narrower than +/-3%, however closely a few comps agree
+        half_range = max(spread, estimate * 0.03)
+        effective_comps = float(1 / np.sum(weights ** 2))
+        dispersion = spread / estimate if estimate else 1.0
+
+        sale_dates_known = int(np.count_nonzero(~np.isnan(sold_at[top])))
+
+        if not np.isnan(subject_sqft):
+            ppsf = estimate / subject_sqft
+        else:
+            ppsf = float(np.dot(weights, adjusted[top] / sqft[top]))
+
+        return {
+            'estimate': int(round(estimate, -3)),
+            'low': int(round(estimate - half_range, -3)),
+            'high': int(round(estimate + half_range, -3)),
+            'price_per_sqft': round(ppsf),
+            'market_price_per_sqft': round(float(np.dot(weights, price[top] / sqft[top]))),
+            'confidence': 'high' if effective_comps >= 3 and dispersion < 0.05 else 'medium' if effective_comps >= 2 and dispersion < 0.12 else 'low',
+            'candidates_considered': len(comps),
+            # Without sale dates, recency is not weighed and no market-time adjustment is made
+            'sale_dates_known': sale_dates_known,
+            'comps': [self._comp_summary(comps[i], i, similarity, distance, np.where(np.isnan(sold_at), np.nan, months), adjustments, adjusted) for i in top]
+        }
+
+    def _plausible(self, candidates):
+        """Candidates with a believable price and living area, minus price-per-square-foot outliers"""
+        low_sqft, high_sqft = self.LIVING_AREA_RANGE
+        comps = [
+            c for c in candidates or []
+            if self._number(c.get('price')) >= self.MIN_PRICE and low_sqft <= self._number(c.get('livingArea')) <= high_sqft
+        ]
+        if not comps:
+            return comps
+        ppsf = np.array([self._number(c.get('price')) / self._number(c.get('livingArea')) for c in comps])
+        median = np.median(ppsf)
+        keep = (ppsf >= median / self.PPSF_MEDIAN_FACTOR) & (ppsf <= median * self.PPSF_MEDIAN_FACTOR)
+        # With fewer comps the quartiles say little about what is unusual
+        if len(comps) >= 4:
+            q1, q3 = np.percentile(ppsf, [25, 75])
+            margin = self.PPSF_IQR_FACTOR * (q3 - q1)
+            keep &= (ppsf >= q1 - margin) & (ppsf <= q3 + margin)
+        return [c for c, kept in zip(comps, keep) if kept]
+
+    @staticmethod
+    def _comp_summary(comp, i, similarity, distance, months, adjustments, adjusted):
+        return {
+            **comp,
+            'similarity': round(float(similarity[i]), 3),
+            'distance_km': None if np.isnan(distance[i]) else round(float(distance[i]), 2),
+            'months_since_sale': None if np.isnan(months[i]) else round(float(months[i]), 1),
+            'adjustments': {name: round(float(values[i])) for name, values in adjustments.items()},
+            'adjusted_price': round(float(adjusted[i]))
+        }
+
+    @staticmethod
+    def _haversine_km(lat, lon, lats, lons):
+        """Distances from one point to arrays of points; NaN where either side has no coordinates"""
+        lat1, lon1, lat2, lon2 = np.radians(lat), np.radians(lon), np.radians(lats), np.radians(lons)
+        h = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(h))
+
+    @staticmethod
+    def _number(value, default=0.0):
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return float(value) if math.isfinite(value) else default
+        try:
+            number = float(str(value).replace(',', '').replace('$', ''))
+        except (TypeError, ValueError):
+            return default
+        return number if math.isfinite(number) else default
+
+    @classmethod
+    def _positive(cls, value):
+        """Number for a size or room count, NaN when missing (Zillow data reports missing as 0)"""
+        number = cls._number(value, np.nan)
+        return number if number > 0 else np.nan
+
+    @staticmethod
+    def _timestamp(value):
+        """Epoch seconds from Zillow's dateSold (epoch milliseconds or an ISO date), NaN if unknown"""
+        if isinstance(value, (int, float)) and value > 0:
+            return value / 1000 if value > 1e11 else float(value)
+        if isinstance(value, str) and value:
+            try:
+                return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+            except ValueError:
+                pass
+        return np.nan
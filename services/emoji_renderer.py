@@ -0,0 +1,138 @@
+import os
+import re
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont
+
+# An emoji cluster: a flag pair, or a pictograph with optional presentation selector and skin tone,
+# joined into ZWJ sequences. Symbols from the basic plane (arrows, dingbats, ...) only count as emoji
+# with an explicit U+FE0F, since text fonts render them fine on their own.
+_EMOJI_BASE = '(?:[\U0001F000-\U0001FAFF]\ufe0f?|[\u2190-\u2bff\u3030\u303d\u3297\u3299]\ufe0f)'
+_SKIN_TONE = '[\U0001F3FB-\U0001F3FF]?'
+EMOJI_PATTERN = re.compile(f'[\U0001F1E6-\U0001F1FF]{{2}}|{_EMOJI_BASE}{_SKIN_TONE}(?:\u200d{_EMOJI_BASE}{_SKIN_TONE})*')
+# An emoji with the whitespace after it, or a presentation selector left on its own
+_PREPARE_PATTERN = re.compile(f'({EMOJI_PATTERN.pattern})\\s*|\ufe0f')
+
+
+class EmojiRenderer:
+    """Emoji glyphs for flyer text, drawn from a PNG atlas or a color emoji font.
+
+    The atlas is a directory of per-emoji PNGs named by codepoint, as shipped by Twemoji
+    (1f6cf.png, 1f468-200d-1f469.png) or Noto (emoji_u1f6cf.png). Each glyph is loaded or
+    rasterized once and then served from memory, scaled per size. With neither source available,
+    emoji are removed from text instead of being drawn as missing-glyph boxes.
+    """
+
+    FONT_FILES = ['NotoColorEmoji.ttf', 'Apple Color Emoji.ttc', 'seguiemj.ttf', 'TwemojiMozilla.ttf']
+    # Bitmap color fonts only load at their strike sizes
+    FONT_SIZES = [109, 128, 160, 96, 64, 48, 40, 32, 20]
+    DEFAULT_ATLAS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'static', 'emoji')
+
+    def __init__(self, font_registry, atlas_dir=None, font_path=None, cache_size=512):
+        atlas_dir = atlas_dir or os.getenv('EMOJI_ATLAS_DIR', self.DEFAULT_ATLAS_DIR)
+        self.atlas = self._index_atlas(atlas_dir)
+        self.atlas_dir = atlas_dir if self.atlas else None
+        self.font = self._load_font(font_path or os.getenv('EMOJI_FONT') or font_registry.find(self.FONT_FILES))
+        self._source = lru_cache(maxsize=cache_size)(self._load_source)
+        self.glyph = lru_cache(maxsize=cache_size)(self._scaled_glyph)
+
+        print(f"Flyer emoji: {self.describe()}")
+
+    @property
+    def enabled(self):
+        return bool(self.atlas or self.font)
+
+    def describe(self):
+        """Which emoji source is in use; part of the flyer render key"""
+        sources = []
+        if self.atlas:
+            sources.append(f'atlas={self.atlas_dir} ({len(self.atlas)} glyphs)')
+        if self.font:
+            sources.append(f'font={self.font.path}')
+        return ', '.join(sources) or 'none (emoji omitted)'
+
+    def prepare(self, text):
+        """Text with every emoji that cannot be drawn removed, together with the space after it"""
+        if text.isascii():
+            return text
+        return _PREPARE_PATTERN.sub(lambda m: m.group(0) if m.group(1) and self._source(m.group(1)) else '', text)
+
+    def split(self, text):
+        """(is_emoji, run) pieces of a line, in order"""
+        pieces, last = [], 0
+        for match in EMOJI_PATTERN.finditer(text):
+            if match.start() > last:
+                pieces.append((False, text[last:match.start()]))
+            pieces.append((True, match.group(0)))
+            last = match.end()
+        if last < len(text):
+            pieces.append((False, text[last:]))
+        return pieces
+
+    @staticmethod
+    def advance(size):
+        """Horizontal space an emoji takes next to text of the given pixel size"""
+        return int(size * 1.15)
+
+    def _scaled_glyph(self, cluster, size):
+        """Square RGBA glyph for an emoji at a pixel size, or None (cached via self.glyph)"""
+        source = self._source(cluster)
+        if source is None:
+            return None
+        return source.resize((size, size), Image.LANCZOS, reducing_gap=2.0)
+
+    def _load_source(self, cluster):
+        """Full-resolution glyph from the atlas, else rasterized once from the color font"""
+        path = self._atlas_path(cluster)
+        if path:
+            try:
+                with Image.open(path) as image:
+                    return self._square(image.convert('RGBA'))
+            except OSError as e:
+                print(f"Emoji atlas error ({path}): {e}")
+        if self.font:
+            bbox = self.font.getbbox(cluster)
+            canvas = Image.new('RGBA', (max(1, bbox[2]), max(1, bbox[3])), (0, 0, 0, 0))
+            ImageDraw.Draw(canvas).text((0, 0), cluster, font=self.font, embedded_color=True)
+            if canvas.getbbox():
+                return self._square(canvas.crop(canvas.getbbox()))
+        return None
+
+    def _atlas_path(self, cluster):
+        codepoints = [f'{ord(c):x}' for c in cluster]
+        without_selector = [c for c in codepoints if c != 'fe0f']
+        for points in (without_selector, codepoints):
+            for name in ('-'.join(points) + '.png', 'emoji_u' + '_'.join(points) + '.png'):
+                if name in self.atlas:
+                    return self.atlas[name]
+        return None
+
+    @staticmethod
+    def _square(image):
+        """Centre a glyph on a transparent square so it scales without distortion"""
+        side = max(image.size)
+        if image.width == image.height:
+            return image
+        square = Image.new('RGBA', (side, side), (0, 0, 0, 0))
+        square.paste(image, ((side - image.width) // 2, (side - image.height) // 2))
+        return square
+
+    @staticmethod
+    def _index_atlas(atlas_dir):
+        if not atlas_dir or not os.path.isdir(atlas_dir):
+            return {}
+        return {name.lower(): os.path.join(atlas_dir, name) for name in os.listdir(atlas_dir) if name.lower().endswith('.png')}
+
+    def _load_font(self, path):
+        if not path:
+            return None
+        for size in self.FONT_SIZES:
+            try:
+                return ImageFont.truetype(path, size)
+            except OSError:
+                continue
+        print(f"Emoji font could not be loaded: {path}")
+        return None
+
+    def stats(self):
+        info = self.glyph.cache_info()
+        return {'source': self.describe(), 'glyphs': {'hits': info.hits, 'misses': info.misses, 'size': info.currsize}}
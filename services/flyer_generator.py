@@ -1,8 +1,32 @@
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image
+import io
 import os
+import hashlib
+from services.artifact_store import ArtifactStore
+from services.cache import TTLCache
+from services.font_registry import FontRegistry
+from services.layout_engine import LayoutEngine
 
 class FlyerGenerator:
-    def __init__(self):
+    # Bump when layout changes so previously stored renders are not reused
+    RENDER_VERSION = 7
+    
+    # Background scaling: LANCZOS for the final pass, with a cheap reduce() first when the source is
+    # more than REDUCING_GAP times the target
+    RESAMPLE = Image.LANCZOS
+    REDUCING_GAP = 3.0
+    
+    def __init__(self, artifact_store=None, font_registry=None, render_pool=None, layout_engine=None):
+        self.artifact_store = artifact_store or ArtifactStore()
+        self.fonts = font_registry or FontRegistry()
+        # Optional RenderPool; without one, flyers render in the calling thread
+        self.render_pool = render_pool
+        # Cover-cropped backgrounds per (source image, flyer size), reused across templates and re-renders
+        self.scaled_backgrounds = TTLCache(
+            max_entries=int(os.getenv('FLYER_SCALE_CACHE_ENTRIES', 32)),
+            max_bytes=int(os.getenv('FLYER_SCALE_CACHE_BYTES', 128 * 1024 * 1024)),
+            default_ttl=600
+        )
         self.social_formats = {
             "flyer": (800, 1000),
             "instagram": (1080, 1920),
@@ -10,54 +34,209 @@ class FlyerGenerator:
             "linkedin": (1200, 627)
         }
         
-        self.templates = {
-            "modern": {
-                "colors": {"primary": "#667eea", "accent": "#FFD700", "text": "white"},
-                "banner_color": (102, 126, 234),
-                "gradient": True
-            },
-            "luxury": {
-                "colors": {"primary": "#2c3e50", "accent": "#f39c12", "text": "#ecf0f1"},
-                "banner_color": (243, 156, 18),
-                "gradient": False
-            },
-            "classic": {
-                "colors": {"primary": "#34495e", "accent": "#e74c3c", "text": "white"},
-                "banner_color": (231, 76, 60),
-                "gradient": True
-            }
+        # Template name -> declarative layout spec (layouts/*.json), compiled per output size
+        self.layouts = layout_engine or LayoutEngine(self.fonts)
+        self.templates = self.layouts.layouts
+        
+        self.output_formats = {
+            "png": {"mimetype": "image/png", "pil_format": "PNG", "options": {"compress_level": 6}},
+            "webp": {"mimetype": "image/webp", "pil_format": "WEBP", "options": {"quality": 90, "method": 4}},
+            "jpeg": {"mimetype": "image/jpeg", "pil_format": "JPEG", "options": {"quality": 90, "progressive": True, "optimize": True}}
         }
     
-    def create_flyer(self, bg_image, address, price, bedrooms, bathrooms, template="modern", format_type="flyer", neighborhood_data=None, mortgage_data=None):
-        flyer_width, flyer_height = self.social_formats.get(format_type, (800, 1000))
-        template_config = self.templates.get(template, self.templates["modern"])
-        bg_image = bg_image.resize((flyer_width, flyer_height))
+    def create_flyer(self, bg_image, address, price, bedrooms, bathrooms, template="modern", format_type="flyer", neighborhood_data=None, mortgage_data=None, output_format="png"):
+        """Render a flyer into the artifact store, returning the file path"""
+        return self.create_flyer_artifact(bg_image, address, price, bedrooms, bathrooms, template, format_type, neighborhood_data, mortgage_data, output_format)['path']
+    
+    def create_flyer_artifact(self, bg_image, address, price, bedrooms, bathrooms, template="modern", format_type="flyer", neighborhood_data=None, mortgage_data=None, output_format="png"):
+        """Render a flyer unless identical inputs were already rendered, and return its stored artifact.
+
+        The result has the artifact path, encoded bytes, mimetype, extension and whether it was a cache hit.
+        """
+        return self._render_artifacts(bg_image, [(format_type, template)], address, price, bedrooms, bathrooms, neighborhood_data, mortgage_data, output_format)[0]
+    
+    def create_flyer_batch(self, bg_image, variants, address, price, bedrooms, bathrooms, neighborhood_data=None, mortgage_data=None, output_format="png"):
+        """Render several (format, template) variants of one listing and return their artifacts in order.
+
+        The source image is decoded, fingerprinted and scaled down to the largest requested size once,
+        so each variant only resizes from that shared copy.
+        """
+        sizes = [self.social_formats.get(format_type, (800, 1000)) for format_type, _ in variants]
+        cover = (max(w for w, _ in sizes), max(h for _, h in sizes))
+        bg_image.info['source_digest'] = self.image_fingerprint(bg_image)
+        if self.render_pool and self.render_pool.enabled and (bg_image.info.get('source_bytes') or bg_image.info.get('source_path')):
+            # Workers get the original file bytes or path, much smaller than pixels, and prescale it themselves
+            return self._render_artifacts(bg_image, variants, address, price, bedrooms, bathrooms, neighborhood_data, mortgage_data, output_format, prescale=cover)
+        source = self.prescaled_source(bg_image, *cover)
+        return self._render_artifacts(source, variants, address, price, bedrooms, bathrooms, neighborhood_data, mortgage_data, output_format)
+    
+    def prescaled_source(self, bg_image, min_width, min_height):
+        """The source decoded once and shrunk to cover min_width x min_height, cached per source and size.
+
+        Shared between renders like scaled_background, so callers must not draw on it.
+        """
+        fingerprint = self.image_fingerprint(bg_image)
+        
+        def prescale():
+            source = self._prescale(bg_image, min_width, min_height)
+            source.info['source_digest'] = fingerprint
+            return source
         
-        overlay = Image.new('RGBA', (flyer_width, flyer_height), (0, 0, 0, 0))
-        draw = ImageDraw.Draw(overlay)
+        return self.scaled_backgrounds.get_or_set((fingerprint, 'source', min_width, min_height), prescale)
+    
+    def _render_artifacts(self, bg_image, variants, address, price, bedrooms, bathrooms, neighborhood_data, mortgage_data, output_format, prescale=None):
+        """Stored artifacts for each variant, rendering only the ones not already in the store.
+
+        Misses go to the render pool together when one is configured, otherwise they render inline.
+        prescale is a (width, height) the workers shrink the source to before rendering.
+        """
+        extension = self._output_extension(output_format)
+        artifacts, misses = [], []
+        for format_type, template in variants:
+            key = self.render_key(bg_image, address, price, bedrooms, bathrooms, template, format_type, neighborhood_data, mortgage_data, extension)
+            path = self.artifact_store.get(key, extension)
+            data = None
+            if path:
+                # Garbage collection may remove the file between the lookup and the read; render it again
+                try:
+                    with open(path, 'rb') as f:
+                        data = f.read()
+                except FileNotFoundError:
+                    path = None
+            artifact = {
+                'path': path,
+                'mimetype': self.output_formats[extension]['mimetype'],
+                'extension': extension,
+                'cache_hit': path is not None,
+                'format': format_type,
+                'template': template
+            }
+            if path:
+                artifact['data'] = data
+            else:
+                misses.append((artifact, key, (address, price, bedrooms, bathrooms, template, format_type, neighborhood_data, mortgage_data)))
+            artifacts.append(artifact)
         
-        # Template-based background
-        text_bg_height = min(250, flyer_height // 4)
-        if template_config["gradient"]:
-            for i in range(text_bg_height):
-                alpha = int(200 * (i / text_bg_height))
-                draw.rectangle([(0, flyer_height - text_bg_height + i), (flyer_width, flyer_height - text_bg_height + i + 1)], 
-                              fill=(0, 0, 0, alpha))
+        if self.render_pool and self.render_pool.enabled:
+            jobs = [(artifact, key, self.render_pool.submit(bg_image, render_args, extension, prescale)) for artifact, key, render_args in misses]
+            rendered = [(artifact, key, future.result()) for artifact, key, future in jobs]
         else:
-            draw.rectangle([(0, flyer_height - text_bg_height), (flyer_width, flyer_height)], 
-                          fill=(44, 62, 80, 180))
+            rendered = [(artifact, key, self.create_flyer_bytes(bg_image, *render_args, output_format=extension)[0]) for artifact, key, render_args in misses]
         
-        # Load fonts
-        scale = min(flyer_width / 800, flyer_height / 1000)
-        try:
-            font_price = ImageFont.truetype("/System/Library/Fonts/Arial Bold.ttf", int(42 * scale))
-            font_address = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", int(28 * scale))
-            font_details = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", int(24 * scale))
-            font_banner = ImageFont.truetype("/System/Library/Fonts/Arial Bold.ttf", int(20 * scale))
-        except:
-            font_price = font_address = font_details = font_banner = ImageFont.load_default()
+        for artifact, key, data in rendered:
+            artifact['data'] = data
+            artifact['path'] = self.artifact_store.put(key, extension, data)
+        return artifacts
+    
+    def _prescale(self, image, min_width, min_height):
+        """The image shrunk (never enlarged) to just cover min_width x min_height, decoded once"""
+        factor = max(min_width / image.width, min_height / image.height)
+        if factor >= 1:
+            return image
+        image = self._decode_near(image, min_width, min_height)
+        factor = max(min_width / image.width, min_height / image.height)
+        if factor >= 1:
+            return image
+        size = (max(min_width, round(image.width * factor)), max(min_height, round(image.height * factor)))
+        return image.resize(size, self.RESAMPLE, reducing_gap=self.REDUCING_GAP)
+    
+    def scaled_background(self, bg_image, width, height):
+        """Background cover-cropped to exactly width x height, cached per source and size.
+
+        The cached image is shared between renders, so callers must not draw on it.
+        """
+        key = (self.image_fingerprint(bg_image), width, height)
+        return self.scaled_backgrounds.get_or_set(key, lambda: self._cover(self._decode_near(bg_image, width, height), width, height))
+    
+    @staticmethod
+    def _decode_near(image, width, height):
+        """Decode the source no larger than needed to cover width x height.
+
+        JPEGs are decoded with DCT scaling (draft) at 1/2, 1/4 or 1/8 size while both sides stay at
+        least the target's. When the original bytes or spooled file are known a fresh image is opened,
+        so an image that is shared or already decoded is left untouched.
+        """
+        source_bytes = image.info.get('source_bytes')
+        if source_bytes:
+            image = Image.open(io.BytesIO(source_bytes))
+        elif image.info.get('source_path'):
+            image = Image.open(image.info['source_path'])
+        if image.format == 'JPEG':
+            image.draft('RGB', (width, height))
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+        return image
+    
+    def _cover(self, image, width, height):
+        """Centre-crop to the target aspect ratio and resize in one pass (box + reducing_gap)"""
+        scale = max(width / image.width, height / image.height)
+        crop_width, crop_height = width / scale, height / scale
+        left, top = (image.width - crop_width) / 2, (image.height - crop_height) / 2
+        box = (left, top, left + crop_width, top + crop_height)
+        return image.resize((width, height), self.RESAMPLE, box=box, reducing_gap=self.REDUCING_GAP)
+    
+    def render_key(self, bg_image, address, price, bedrooms, bathrooms, template, format_type, neighborhood_data, mortgage_data, output_format):
+        """Hash of everything that affects the rendered pixels"""
+        return self.artifact_store.make_key(
+            self.RENDER_VERSION, self.image_fingerprint(bg_image), address, price, bedrooms, bathrooms,
+            self.layouts.get(template), self.layouts.text_layout.emoji.describe(), format_type, neighborhood_data, mortgage_data, output_format
+        )
+    
+    @staticmethod
+    def image_fingerprint(image):
+        """Digest of the source image, using the digest recorded at download/upload time when available"""
+        digest = image.info.get('source_digest')
+        if digest:
+            return digest
+        return hashlib.sha256(image.tobytes()).hexdigest()
+    
+    def create_flyer_bytes(self, bg_image, address, price, bedrooms, bathrooms, template="modern", format_type="flyer", neighborhood_data=None, mortgage_data=None, output_format="png"):
+        """Render a flyer in memory and return (encoded bytes, mimetype, file extension)"""
+        final_image = self.render_flyer(bg_image, address, price, bedrooms, bathrooms, template, format_type, neighborhood_data, mortgage_data)
+        return self.encode_image(final_image, output_format)
+    
+    def encode_image(self, image, output_format="png"):
+        """Encode a rendered flyer as PNG, WebP or progressive JPEG"""
+        extension = self._output_extension(output_format)
+        encoding = self.output_formats[extension]
+        
+        buffer = io.BytesIO()
+        image.save(buffer, encoding["pil_format"], **encoding["options"])
+        return buffer.getvalue(), encoding["mimetype"], extension
+    
+    def _output_extension(self, output_format):
+        output_format = "jpeg" if output_format == "jpg" else output_format
+        return output_format if output_format in self.output_formats else "png"
+    
+    def render_flyer(self, bg_image, address, price, bedrooms, bathrooms, template="modern", format_type="flyer", neighborhood_data=None, mortgage_data=None):
+        """Compose the flyer from its compiled layout plan and return it as an RGB image"""
+        flyer_width, flyer_height = self.social_formats.get(format_type, (800, 1000))
+        plan = self.layouts.plan(template, format_type, flyer_width, flyer_height)
+        # Copy, since the scaled background is cached and shared
+        flyer = self.scaled_background(bg_image, flyer_width, flyer_height).convert('RGB')
+        
+        # Static parts come pre-rendered in the plan; only listing text is drawn here
+        for sprite, position in plan.sprites:
+            flyer.paste(sprite, position, sprite)
         
-        # Format price
+        fields = self._layout_fields(address, price, bedrooms, bathrooms, neighborhood_data, mortgage_data)
+        for text in plan.texts:
+            if any(fields.get(f) in (None, '') for f in text['fields'] + text['when']):
+                continue
+            if any(fields.get(f) not in (None, '') for f in text['unless']):
+                continue
+            try:
+                content = text['text'].format(**fields)
+            except (ValueError, KeyError, IndexError) as e:
+                print(f"Skipping layout text {text['text']!r}: {e}")
+                continue
+            self.layouts.draw_text(flyer, text, content)
+        
+        return flyer
+    
+    @staticmethod
+    def _layout_fields(address, price, bedrooms, bathrooms, neighborhood_data, mortgage_data):
+        """Values for the listing fields layouts can reference (see LayoutEngine.FIELDS)"""
         try:
             price_num = float(price.replace(',', '').replace('$', ''))
             if price_num >= 1000000:
@@ -69,71 +248,19 @@ class FlyerGenerator:
         except:
             price_display = f"${price}"
         
-        # Add content
-        margin = int(30 * scale)
-        y_pos = flyer_height - int(220 * scale)
-        
-        draw.text((margin, y_pos), price_display, fill=template_config["colors"]["accent"], font=font_price)
-        y_pos += int(55 * scale)
-        
-        draw.text((margin, y_pos), address, fill=template_config["colors"]["text"], font=font_address)
-        y_pos += int(40 * scale)
-        
-        details = f"🛏️ {bedrooms} Bedrooms  •  🛁 {bathrooms} Bathrooms"
-        draw.text((margin, y_pos), details, fill='#E0E0E0', font=font_details)
-        
-        # Add AI neighborhood story if available
-        if neighborhood_data and neighborhood_data.get('story') and format_type in ['flyer', 'linkedin']:
-            y_pos += int(35 * scale)
-            
-            story = neighborhood_data['story']
-            story_text = story.get('headline', '')
-            
-            # Use smaller font for story
-            try:
-                font_story = ImageFont.truetype("/System/Library/Fonts/Arial Bold.ttf", int(20 * scale))
-            except:
-                font_story = font_details
-            
-            draw.text((margin, y_pos), story_text, fill='#FFD700', font=font_story)
-        
-        # Add insights if available and space permits
-        elif neighborhood_data and mortgage_data and format_type in ['flyer', 'linkedin']:
-            y_pos += int(35 * scale)
-            
-            # Key insights line
-            insights = f"🚶 Walk Score: {neighborhood_data['walkability_score']} • 💰 ${mortgage_data['monthly_payment']:,}/mo • 🏫 {neighborhood_data['schools_nearby']} Schools"
-            
-            # Use smaller font for insights
-            try:
-                font_insights = ImageFont.truetype("/System/Library/Fonts/Arial.ttf", int(18 * scale))
-            except:
-                font_insights = font_details
-            
-            draw.text((margin, y_pos), insights, fill='#C0C0C0', font=font_insights)
-        
-        # Banner
-        banner_width, banner_height = int(180 * scale), int(50 * scale)
-        banner_x = flyer_width - banner_width - int(20 * scale)
-        draw.rectangle([(banner_x, int(30 * scale)), (banner_x + banner_width, int(30 * scale) + banner_height)], 
-                      fill=template_config["banner_color"])
-        
-        bbox = draw.textbbox((0, 0), "FOR SALE", font=font_banner)
-        text_width = bbox[2] - bbox[0]
-        text_x = banner_x + (banner_width - text_width) // 2
-        draw.text((text_x, int(42 * scale)), "FOR SALE", fill='white', font=font_banner)
-        
-        # Add top school for social formats
-        if neighborhood_data and format_type in ['instagram', 'facebook']:
-            school_text = f"📍 Near {neighborhood_data['top_school']}"
-            draw.text((margin, flyer_height - int(70 * scale)), school_text, fill='#D0D0D0', font=font_details)
-        
-        draw.text((margin, flyer_height - int(40 * scale)), "Contact: Your Real Estate Agent", fill='#B0B0B0', font=font_details)
-        
-        final_image = Image.alpha_composite(bg_image.convert('RGBA'), overlay)
-        
-        os.makedirs('generated', exist_ok=True)
-        output_path = f'generated/{format_type}_{template}.png'
-        final_image.convert('RGB').save(output_path, quality=95)
-        
-        return output_path
\ No newline at end of file
+        neighborhood_data = neighborhood_data or {}
+        story = neighborhood_data.get('story') or {}
+        payment_table = (mortgage_data or {}).get('payment_table') or []
+        return {
+            'price': price_display,
+            'address': address,
+            'bedrooms': bedrooms,
+            'bathrooms': bathrooms,
+            'story_headline': story.get('headline'),
+            'walkability_score': neighborhood_data.get('walkability_score'),
+            'schools_nearby': neighborhood_data.get('schools_nearby'),
+            'top_school': neighborhood_data.get('top_school'),
+            'monthly_payment': (mortgage_data or {}).get('monthly_payment'),
+            # One "<down>% down  $<payment>/mo" line per down payment option
+            'payment_table': '\n'.join(f"{row['down_payment_percent']:g}% down  ${row['monthly_payment']:,}/mo" for row in payment_table) or None
+        }
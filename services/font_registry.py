@@ -0,0 +1,80 @@
+import os
+from functools import lru_cache
+from PIL import ImageFont
+
+
+class FontRegistry:
+    # Candidate files per face, in order of preference (macOS, then common Linux and Windows fonts)
+    FACES = {
+        'regular': ['Arial.ttf', 'Helvetica.ttc', 'LiberationSans-Regular.ttf', 'DejaVuSans.ttf', 'NotoSans-Regular.ttf', 'FreeSans.ttf', 'arial.ttf'],
+        'bold': ['Arial Bold.ttf', 'Arial-Bold.ttf', 'LiberationSans-Bold.ttf', 'DejaVuSans-Bold.ttf', 'NotoSans-Bold.ttf', 'FreeSansBold.ttf', 'arialbd.ttf']
+    }
+
+    DEFAULT_DIRS = [
+        '/System/Library/Fonts',
+        '/System/Library/Fonts/Supplemental',
+        '/Library/Fonts',
+        '/usr/share/fonts',
+        '/usr/local/share/fonts',
+        '~/.fonts',
+        '~/.local/share/fonts',
+        'C:/Windows/Fonts'
+    ]
+
+    def __init__(self, font_dirs=None, cache_size=64):
+        configured = os.getenv('FLYER_FONT_DIRS', '')
+        extra_dirs = font_dirs or [d for d in configured.split(os.pathsep) if d]
+        self.font_dirs = [os.path.expanduser(d) for d in extra_dirs + self.DEFAULT_DIRS]
+        self.paths = self._resolve_faces()
+        self._get = lru_cache(maxsize=cache_size)(self._load_font)
+
+        resolved = ', '.join(f"{face}={path or 'built-in default'}" for face, path in self.paths.items())
+        print(f"Flyer fonts: {resolved}")
+
+    def get(self, face, size):
+        """Font for a face at a pixel size, loaded once and then served from the LRU"""
+        return self._get(face, max(1, int(size)))
+
+    def report(self):
+        info = self._get.cache_info()
+        return {
+            'fonts': dict(self.paths),
+            'font_dirs': [d for d in self.font_dirs if os.path.isdir(d)],
+            'cache': {'hits': info.hits, 'misses': info.misses, 'size': info.currsize}
+        }
+
+    def _load_font(self, face, size):
+        path = self.paths.get(face) or self.paths.get('regular')
+        if path:
+            try:
+                return ImageFont.truetype(path, size)
+            except OSError as e:
+                print(f"Font load error ({path}): {e}")
+        try:
+            return ImageFont.load_default(size)
+        except TypeError:
+            # Pillow < 10.1 has no scalable default font
+            return ImageFont.load_default()
+
+    def find(self, candidates):
+        """Path of the first candidate font file present in the font directories, or None"""
+        return next((self._index[c.lower()] for c in candidates if c.lower() in self._index), None)
+
+    def _resolve_faces(self):
+        """Find each face once: explicit FLYER_FONT_<FACE> paths first, then the font directories"""
+        self._index = {}
+        for font_dir in self.font_dirs:
+            if not os.path.isdir(font_dir):
+                continue
+            for root, _, files in os.walk(font_dir):
+                for name in files:
+                    self._index.setdefault(name.lower(), os.path.join(root, name))
+
+        paths = {}
+        for face, candidates in self.FACES.items():
+            override = os.getenv(f'FLYER_FONT_{face.upper()}')
+            if override and os.path.isfile(override):
+                paths[face] = override
+                continue
+            paths[face] = self.find(candidates)
+        return paths
@@ -0,0 +1,238 @@
+import os
+import re
+import csv
+import time
+import sqlite3
+import threading
+from contextlib import closing, contextmanager
+from services.cache import TTLCache, normalize_address
+from services.http_client import http_client
+
+
+# Street suffixes and directions spelled out or abbreviated, so "123 Main Street" and "123 main st" match
+_ABBREVIATIONS = {
+    'street': 'st', 'avenue': 'ave', 'boulevard': 'blvd', 'road': 'rd', 'drive': 'dr', 'lane': 'ln',
+    'court': 'ct', 'place': 'pl', 'terrace': 'ter', 'parkway': 'pkwy', 'highway': 'hwy', 'circle': 'cir',
+    'square': 'sq', 'trail': 'trl', 'north': 'n', 'south': 's', 'east': 'e', 'west': 'w',
+    'northeast': 'ne', 'northwest': 'nw', 'southeast': 'se', 'southwest': 'sw'
+}
+_COUNTRY_SUFFIX = re.compile(r'\s+(usa|us|united states( of america)?)$')
+_POSTCODE_SUFFIX = re.compile(r'\s+\d{5}(-\d{4})?$')
+
+
+def geocode_key(address):
+    """Canonical form of an address for geocode lookups: normalized, abbreviated, without ZIP or country"""
+    key = normalize_address(address)
+    key = _COUNTRY_SUFFIX.sub('', key)
+    key = _POSTCODE_SUFFIX.sub('', key)
+    return ' '.join(_ABBREVIATIONS.get(word, word) for word in key.split())
+
+
+class Geocoder:
+    """Address -> (lat, lon), answered locally whenever possible.
+
+    Lookups go through an in-memory cache, an optional local gazetteer (CSV or Parquet of address
+    points) and a persistent SQLite cache before Nominatim is asked. Nominatim's public endpoint allows
+    about one request per second, so calls to it are spaced out and a lookup that would have to wait
+    longer than max_wait gives up instead of queueing behind the limit.
+    """
+
+    ADDRESS_COLUMNS = ('address', 'full_address', 'formatted_address')
+    LAT_COLUMNS = ('lat', 'latitude', 'y')
+    LON_COLUMNS = ('lon', 'lng', 'long', 'longitude', 'x')
+    # Address parts joined when the gazetteer has no single address column (OpenAddresses style)
+    PART_COLUMNS = ('number', 'street', 'unit', 'city', 'region', 'state')
+
+    def __init__(self, path=None, gazetteer_path=None, ttl=None, negative_ttl=None, min_interval=None, max_wait=None):
+        self.path = path or os.getenv('GEOCODE_CACHE_PATH', 'cache/geocode.sqlite3')
+        self.ttl = ttl if ttl is not None else int(os.getenv('GEOCODE_CACHE_TTL', 180 * 24 * 3600))
+        # Addresses Nominatim could not find are remembered for less time
+        self.negative_ttl = negative_ttl if negative_ttl is not None else int(os.getenv('GEOCODE_NEGATIVE_TTL', 24 * 3600))
+        self.min_interval = min_interval if min_interval is not None else float(os.getenv('GEOCODE_MIN_INTERVAL', 1.0))
+        self.max_wait = max_wait if max_wait is not None else float(os.getenv('GEOCODE_MAX_WAIT', 3.0))
+        self.nominatim_url = 'https://nominatim.openstreetmap.org'
+        self.enabled = True
+        self.memory = TTLCache(max_entries=5000, max_bytes=5 * 1024 * 1024, default_ttl=3600)
+        self._lock = threading.Lock()
+        self._next_request_at = 0.0
+        self.lookups = {'cache': 0, 'gazetteer': 0, 'nominatim': 0, 'rate_limited': 0, 'failed': 0}
+
+        try:
+            self._init_db()
+        except sqlite3.Error as e:
+            print(f"Geocode cache disabled: {e}")
+            self.enabled = False
+
+        self.gazetteer = self._load_gazetteer(gazetteer_path or os.getenv('GEOCODE_GAZETTEER'))
+
+    def geocode(self, address):
+        """(lat, lon) for an address, or None if it cannot be located right now"""
+        key = geocode_key(address)
+        if not key:
+            return None
+        # Concurrent lookups of the same address share one resolution. Known misses come back as
+        # (None, None) and are cached; None (rate limited, network error) is retried next time.
+        point = self.memory.get_or_set(key, lambda: self._resolve(key, address))
+        return point if point and point[0] is not None else None
+
+    def _resolve(self, key, address):
+        point = self.gazetteer.get(key)
+        if point:
+            self._count('gazetteer')
+            return point
+
+        cached = self._cache_get(key)
+        if cached is not None:
+            self._count('cache')
+            return cached
+
+        return self._nominatim(key, address)
+
+    def _nominatim(self, key, address):
+        if not self._wait_for_slot():
+            self._count('rate_limited')
+            return None
+
+        try:
+            response = http_client.get(
+                f"{self.nominatim_url}/search",
+                params={'q': address, 'format': 'json', 'limit': 1},
+                headers={'User-Agent': 'RealEstateFlyerGenerator/1.0'}
+            )
+            if response.status_code != 200:
+                self._count('failed')
+                return None
+            data = response.json()
+        except Exception as e:
+            print(f"Nominatim error: {e}")
+            self._count('failed')
+            return None
+
+        self._count('nominatim')
+        point = (float(data[0]['lat']), float(data[0]['lon'])) if data else (None, None)
+        self._cache_set(key, point, 'nominatim')
+        return point
+
+    def _wait_for_slot(self):
+        """Sleep until this caller may send the next Nominatim request, or False if that is too far off"""
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_request_at)
+            if slot - now > self.max_wait:
+                return False
+            self._next_request_at = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+        return True
+
+    def _count(self, outcome):
+        with self._lock:
+            self.lookups[outcome] += 1
+
+    def stats(self):
+        entries = 0
+        if self.enabled:
+            try:
+                with self._connect() as conn:
+                    entries = conn.execute('SELECT COUNT(*) FROM geocodes').fetchone()[0]
+            except sqlite3.Error:
+                pass
+        return {
+            'enabled': self.enabled,
+            'entries': entries,
+            'gazetteer_points': len(self.gazetteer),
+            'lookups': dict(self.lookups),
+            'memory': self.memory.stats()
+        }
+
+    def _cache_get(self, key):
+        """Cached point, (None, None) for a remembered miss, or None if not cached"""
+        if not self.enabled:
+            return None
+        try:
+            with self._connect() as conn:
+                row = conn.execute('SELECT lat, lon, created_at FROM geocodes WHERE key = ?', (key,)).fetchone()
+        except sqlite3.Error as e:
+            print(f"Geocode cache read error: {e}")
+            return None
+        if not row:
+            return None
+        ttl = self.ttl if row[0] is not None else self.negative_ttl
+        if time.time() - row[2] > ttl:
+            return None
+        return (row[0], row[1])
+
+    def _cache_set(self, key, point, source):
+        if not self.enabled:
+            return
+        try:
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO geocodes (key, lat, lon, source, created_at) VALUES (?, ?, ?, ?, ?)',
+                    (key, point[0], point[1], source, time.time())
+                )
+        except sqlite3.Error as e:
+            print(f"Geocode cache write error: {e}")
+
+    @contextmanager
+    def _connect(self):
+        """Connection for one transaction: committed (or rolled back) and then closed"""
+        with closing(sqlite3.connect(self.path, timeout=5)) as conn, conn:
+            yield conn
+
+    def _init_db(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS geocodes ('
+                'key TEXT PRIMARY KEY, lat REAL, lon REAL, source TEXT NOT NULL, created_at REAL NOT NULL)'
+            )
+
+    def _load_gazetteer(self, path):
+        """Index of geocode_key(address) -> (lat, lon) from a CSV or Parquet file of address points"""
+        if not path:
+            return {}
+        try:
+            rows = self._read_parquet(path) if path.endswith('.parquet') else self._read_csv(path)
+            index = {}
+            for row in rows:
+                point = self._row_point(row)
+                if point:
+                    index[point[0]] = point[1]
+        except (OSError, ValueError, ImportError, csv.Error) as e:
+            print(f"Geocode gazetteer not loaded ({path}): {e}")
+            return {}
+        print(f"Geocode gazetteer: {len(index)} addresses from {path}")
+        return index
+
+    @staticmethod
+    def _read_csv(path):
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                yield {name.strip().lower(): value for name, value in row.items() if name}
+
+    @staticmethod
+    def _read_parquet(path):
+        # Optional dependency, only needed for Parquet gazetteers
+        import pyarrow.parquet as pq
+        table = pq.read_table(path)
+        columns = {name.lower(): table.column(name).to_pylist() for name in table.column_names}
+        for i in range(table.num_rows):
+            yield {name: values[i] for name, values in columns.items()}
+
+    def _row_point(self, row):
+        """(key, (lat, lon)) for a gazetteer row, or None if it lacks an address or coordinates"""
+        address = next((row[c] for c in self.ADDRESS_COLUMNS if row.get(c)), None)
+        if not address:
+            address = ' '.join(str(row[c]) for c in self.PART_COLUMNS if row.get(c))
+        lat = next((row[c] for c in self.LAT_COLUMNS if row.get(c) not in (None, '')), None)
+        lon = next((row[c] for c in self.LON_COLUMNS if row.get(c) not in (None, '')), None)
+        if not address or lat is None or lon is None:
+            return None
+        try:
+            return geocode_key(address), (float(lat), float(lon))
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,112 @@
+import os
+import threading
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class _CappedRetry(Retry):
+    """Retry that honors Retry-After only up to max_retry_after seconds, since the wait blocks a request thread"""
+
+    def __init__(self, *args, max_retry_after=2.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_retry_after = max_retry_after
+
+    def new(self, **kwargs):
+        # urllib3 builds a fresh Retry after every attempt from its own constructor arguments
+        retry = super().new(**kwargs)
+        retry.max_retry_after = self.max_retry_after
+        return retry
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, self.max_retry_after)
+
+
+class HttpClient:
+    # Rate-limited hosts whose callers pace their own requests: error statuses go straight back to them
+    # instead of being retried here behind their throttle
+    NO_STATUS_RETRY_HOSTS = ('nominatim.openstreetmap.org', 'overpass-api.de')
+
+    def __init__(self, timeout=None, pool_connections=None, pool_maxsize=None, max_retries=None, backoff_factor=None, max_retry_after=None):
+        self.timeout = timeout if timeout is not None else float(os.getenv('HTTP_TIMEOUT', 15))
+        self.pool_connections = pool_connections or int(os.getenv('HTTP_POOL_CONNECTIONS', 10))
+        self.pool_maxsize = pool_maxsize or int(os.getenv('HTTP_POOL_MAXSIZE', 20))
+        self.max_retries = max_retries if max_retries is not None else int(os.getenv('HTTP_MAX_RETRIES', 2))
+        self.backoff_factor = backoff_factor if backoff_factor is not None else float(os.getenv('HTTP_BACKOFF_FACTOR', 0.5))
+        self.max_retry_after = max_retry_after if max_retry_after is not None else float(os.getenv('HTTP_MAX_RETRY_AFTER', 2))
+
+        # Only idempotent methods are retried; POSTs (OpenAI, Overpass, OAuth) are sent once
+        adapter = self._adapter((429, 500, 502, 503, 504))
+        self.session = requests.Session()
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        # Connection errors are still retried for the rate-limited hosts (nothing reached the server)
+        throttled_adapter = self._adapter(())
+        for host in self.NO_STATUS_RETRY_HOSTS:
+            self.session.mount(f'https://{host}/', throttled_adapter)
+
+        self._lock = threading.Lock()
+        self._requests_by_host = defaultdict(int)
+
+    def _adapter(self, status_forcelist):
+        retry = _CappedRetry(
+            total=self.max_retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=status_forcelist,
+            allowed_methods=frozenset(['GET', 'HEAD', 'OPTIONS']),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+            max_retry_after=self.max_retry_after
+        )
+        return HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize, max_retries=retry)
+
+    def request(self, method, url, **kwargs):
+        """Send a request over the shared session, applying the default timeout"""
+        kwargs.setdefault('timeout', self.timeout)
+        with self._lock:
+            self._requests_by_host[urlsplit(url).netloc] += 1
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def stats(self):
+        """Per-host request and connection counters, showing how often connections were reused"""
+        connections_by_host = defaultdict(int)
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    connections_by_host[pool.host] += pool.num_connections
+
+        with self._lock:
+            requests_by_host = dict(self._requests_by_host)
+
+        hosts = {}
+        for netloc, count in requests_by_host.items():
+            host = netloc.rsplit(':', 1)[0] if ':' in netloc and not netloc.endswith(']') else netloc
+            connections = connections_by_host.get(host, 0)
+            hosts[netloc] = {
+                'requests': count,
+                'connections_opened': connections,
+                'connections_reused': max(0, count - connections)
+            }
+
+        return {
+            'timeout': self.timeout,
+            'pool_maxsize': self.pool_maxsize,
+            'max_retries': self.max_retries,
+            'hosts': hosts
+        }
+
+
+# Shared by every service so repeated calls to the same host reuse pooled connections
+http_client = HttpClient()
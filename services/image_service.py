@@ -1,12 +1,31 @@
-import requests
+from services.http_client import http_client
+import os
 import random
+import tempfile
 from PIL import Image
 import io
+import hashlib
+
+
+class InvalidImageError(Exception):
+    """A listing photo that could not be fetched, is too large, or is not an acceptable image"""
+
+
+class ImageDownloadError(Exception):
+    """No background photo could be downloaded for a flyer"""
+
 
 class ImageService:
     def __init__(self, freepik_api_key=None):
         self.freepik_api_key = freepik_api_key
         self.freepik_base_url = 'https://api.freepik.com/v1'
+        
+        # Limits on listing photos: compressed size, decoded pixel count (decompression bombs), and the
+        # size up to which a download is kept in memory rather than spooled to a temporary file
+        self.max_image_bytes = int(os.getenv('IMAGE_MAX_BYTES', 15 * 1024 * 1024))
+        self.max_image_pixels = int(os.getenv('IMAGE_MAX_PIXELS', 40_000_000))
+        self.spool_bytes = int(os.getenv('IMAGE_SPOOL_BYTES', 4 * 1024 * 1024))
+        self.allowed_formats = {'JPEG', 'MPO', 'PNG', 'WEBP', 'GIF'}
         self.fallback_images = [
             'https://images.unsplash.com/photo-1570129477492-45c003edd2be?w=800&h=1000&fit=crop&crop=center',
             'https://images.unsplash.com/photo-1564013799919-ab600027ffc6?w=800&h=1000&fit=crop&crop=center',
@@ -34,12 +53,12 @@ class ImageService:
         }
         
         try:
-            response = requests.get(f'{self.freepik_base_url}/resources', headers=headers, params=params)
+            response = http_client.get(f'{self.freepik_base_url}/resources', headers=headers, params=params)
             if response.status_code == 200:
                 data = response.json()
                 if data.get('data'):
                     file_id = data['data'][0]['id']
-                    download_response = requests.get(f'{self.freepik_base_url}/file/{file_id}', headers=headers)
+                    download_response = http_client.get(f'{self.freepik_base_url}/file/{file_id}', headers=headers)
                     if download_response.status_code == 200:
                         return download_response.json().get('url')
         except Exception as e:
@@ -51,5 +70,73 @@ class ImageService:
         return random.choice(self.fallback_images)
     
     def get_image_from_url(self, url):
-        response = requests.get(url, timeout=10)
-        return Image.open(io.BytesIO(response.content))
\ No newline at end of file
+        """Download a listing photo without ever holding more than max_image_bytes of it.
+
+        The body is streamed over the shared connection pool, checked against the headers first and
+        the byte limit as it arrives, then validated as an image before anything is decoded. Photos
+        over spool_bytes go to a temporary file, which render workers and the resize stage read by path.
+        """
+        with http_client.get(url, timeout=10, stream=True) as response:
+            if response.status_code != 200:
+                raise InvalidImageError(f'HTTP {response.status_code} for {url}')
+            
+            content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+            if content_type and not content_type.startswith('image/') and content_type != 'application/octet-stream':
+                raise InvalidImageError(f'Not an image ({content_type}): {url}')
+            declared_length = response.headers.get('Content-Length')
+            if declared_length and declared_length.isdigit() and int(declared_length) > self.max_image_bytes:
+                raise InvalidImageError(f'Image too large ({declared_length} bytes): {url}')
+            
+            buffer, spool = io.BytesIO(), None
+            digest = hashlib.sha256()
+            size = 0
+            try:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    size += len(chunk)
+                    if size > self.max_image_bytes:
+                        raise InvalidImageError(f'Image exceeds {self.max_image_bytes} bytes: {url}')
+                    if spool is None and size > self.spool_bytes:
+                        spool = tempfile.NamedTemporaryFile(prefix='listing-photo-')
+                        spool.write(buffer.getvalue())
+                        buffer = spool
+                    digest.update(chunk)
+                    buffer.write(chunk)
+            except BaseException:
+                buffer.close()
+                raise
+        
+        if spool is None:
+            # Small enough to keep: render workers and the resize stage reuse these compressed bytes
+            return self.open_image(buffer.getvalue(), digest.hexdigest())
+        spool.flush()
+        return self.open_image(spool, digest.hexdigest())
+    
+    def open_image(self, source, digest=None):
+        """Open image bytes, or a named temporary file together with its digest, after checking
+        its format and pixel count.
+
+        Only the header is read here; pixels are decoded later, at the size the flyer needs.
+        """
+        data = source if isinstance(source, (bytes, bytearray)) else None
+        if data is None and not digest:
+            raise ValueError('open_image needs the digest of a file source')
+        try:
+            image = Image.open(io.BytesIO(data) if data is not None else source.name)
+        except (OSError, Image.DecompressionBombError) as e:
+            raise InvalidImageError(f'Unreadable image: {e}')
+        
+        if image.format not in self.allowed_formats:
+            raise InvalidImageError(f'Unsupported image format: {image.format}')
+        if image.width * image.height > self.max_image_pixels:
+            raise InvalidImageError(f'Image too large to decode ({image.width}x{image.height})')
+        
+        # Lets the flyer artifact store key renders on the source bytes without hashing decoded pixels
+        image.info['source_digest'] = digest or hashlib.sha256(data).hexdigest()
+        # Render workers receive the compressed bytes, or the spooled file's path, never decoded pixels
+        if data is not None:
+            image.info['source_bytes'] = bytes(data)
+        else:
+            image.info['source_path'] = source.name
+            # Keeps the temporary file alive (it is deleted on close) as long as any image refers to it
+            image.info['source_file'] = source
+        return image
@@ -0,0 +1,313 @@
+import os
+import json
+import string
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageColor
+from services.text_layout import TextLayout
+from services.emoji_renderer import EmojiRenderer
+
+
+class LayoutError(ValueError):
+    """A flyer layout spec that cannot be loaded or does not validate"""
+
+
+class RenderPlan:
+    """A layout compiled for one output size: pre-rendered static sprites plus positioned text operations"""
+
+    def __init__(self, name, width, height, sprites, texts):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.sprites = sprites
+        self.texts = texts
+
+
+class LayoutEngine:
+    """Loads declarative flyer layouts (one JSON file per template) and compiles them into render plans.
+
+    Geometry is given in units of an 800x1000 flyer and scaled to each output size. Text layers are
+    str.format templates over the listing fields in FIELDS, skipped when a field they use is empty or
+    when/unless conditions fail. Layers without fields are static and get pre-rendered into the plan,
+    so a render only draws the listing-specific text. All text is fitted to its box (max_width,
+    max_lines), shrinking towards min_size before it is cut with an ellipsis.
+    """
+
+    BASE_SIZE = (800, 1000)
+    LAYER_TYPES = ('backdrop', 'box', 'text')
+    ANCHORS = ('top-left', 'top-center', 'top-right', 'bottom-left', 'bottom-center', 'bottom-right')
+    FIELDS = (
+        'price', 'address', 'bedrooms', 'bathrooms', 'story_headline',
+        'walkability_score', 'schools_nearby', 'top_school', 'monthly_payment', 'payment_table'
+    )
+    DEFAULT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'layouts')
+
+    def __init__(self, font_registry, layout_dir=None, default_layout='modern', text_layout=None):
+        self.fonts = font_registry
+        self.text_layout = text_layout or TextLayout(font_registry, EmojiRenderer(font_registry))
+        self.layout_dir = layout_dir or os.getenv('FLYER_LAYOUT_DIR', self.DEFAULT_DIR)
+        self.layouts = self.load_layouts(self.layout_dir)
+        if not self.layouts:
+            raise LayoutError(f'No valid flyer layouts found in {self.layout_dir}')
+        self.default_layout = default_layout if default_layout in self.layouts else next(iter(self.layouts))
+        self.plan = lru_cache(maxsize=64)(self._compile)
+        print(f"Flyer layouts: {', '.join(self.layouts)}")
+
+    def get(self, name):
+        """Layout spec by template name, falling back to the default layout"""
+        return self.layouts.get(name) or self.layouts[self.default_layout]
+
+    def load_layouts(self, layout_dir):
+        """Read and validate every *.json layout in a directory; invalid files are reported and skipped"""
+        layouts = {}
+        if not os.path.isdir(layout_dir):
+            return layouts
+        for filename in sorted(os.listdir(layout_dir)):
+            if not filename.endswith('.json'):
+                continue
+            path = os.path.join(layout_dir, filename)
+            try:
+                with open(path) as f:
+                    spec = json.load(f)
+                self.validate(spec)
+            except (OSError, ValueError, TypeError) as e:
+                print(f"Skipping flyer layout {filename}: {e}")
+                continue
+            layouts[spec['name']] = spec
+        return layouts
+
+    def validate(self, spec):
+        """Raise LayoutError describing the first problem in a layout spec"""
+        if not isinstance(spec, dict) or not isinstance(spec.get('name'), str) or not spec['name']:
+            raise LayoutError('layout needs a "name"')
+        palette = spec.get('colors', {})
+        if not isinstance(palette, dict):
+            raise LayoutError('"colors" must be an object of name -> color')
+        for name, color in palette.items():
+            self._parse_color(color, {}, f'colors.{name}')
+        layers = spec.get('layers')
+        if not isinstance(layers, list) or not layers:
+            raise LayoutError('layout needs a non-empty "layers" list')
+
+        for i, layer in enumerate(layers):
+            where = f'layers[{i}]'
+            if not isinstance(layer, dict) or layer.get('type') not in self.LAYER_TYPES:
+                raise LayoutError(f'{where}: "type" must be one of {", ".join(self.LAYER_TYPES)}')
+            formats = layer.get('formats')
+            if formats is not None and not (isinstance(formats, list) and all(isinstance(f, str) for f in formats)):
+                raise LayoutError(f'{where}: "formats" must be a list of format names')
+
+            if layer['type'] == 'backdrop':
+                self._require_numbers(layer, ('height',), where)
+                self._require_numbers(layer, ('max_fraction', 'alpha'), where, optional=True)
+                if layer.get('style', 'solid') not in ('solid', 'gradient'):
+                    raise LayoutError(f'{where}: "style" must be solid or gradient')
+                if not isinstance(layer.get('scale_height', True), bool):
+                    raise LayoutError(f'{where}: "scale_height" must be true or false')
+                if not 0 < layer.get('max_fraction', 1) <= 1:
+                    raise LayoutError(f'{where}: "max_fraction" must be in (0, 1]')
+                if not 0 <= layer.get('alpha', 255) <= 255:
+                    raise LayoutError(f'{where}: "alpha" must be 0-255')
+                self._parse_color(layer.get('color', [0, 0, 0]), palette, where)
+                continue
+
+            if layer.get('anchor', 'top-left') not in self.ANCHORS:
+                raise LayoutError(f'{where}: "anchor" must be one of {", ".join(self.ANCHORS)}')
+            self._require_numbers(layer, ('x', 'y'), where)
+            if layer['type'] == 'box':
+                self._require_numbers(layer, ('width', 'height'), where)
+                self._require_numbers(layer, ('text_y',), where, optional=True)
+                self._parse_color(layer.get('fill'), palette, where)
+            if layer['type'] == 'text' or 'text' in layer:
+                self._validate_text(layer, palette, where)
+            if layer['type'] == 'box' and self._is_dynamic(layer):
+                raise LayoutError(f'{where}: box labels cannot use listing fields')
+
+    def _validate_text(self, layer, palette, where):
+        if not isinstance(layer.get('text'), str):
+            raise LayoutError(f'{where}: "text" must be a string')
+        unknown = [f for f in self._text_fields(layer['text']) if f not in self.FIELDS]
+        for key in ('when', 'unless'):
+            value = layer.get(key, [])
+            if not isinstance(value, list):
+                raise LayoutError(f'{where}: "{key}" must be a list of field names')
+            unknown += [f for f in value if f not in self.FIELDS]
+        if unknown:
+            raise LayoutError(f'{where}: unknown field(s) {", ".join(unknown)}; available: {", ".join(self.FIELDS)}')
+        if not isinstance(layer.get('font', 'regular'), str) or layer.get('font', 'regular') not in self.fonts.FACES:
+            raise LayoutError(f'{where}: "font" must be one of {", ".join(self.fonts.FACES)}')
+        if not isinstance(layer.get('size'), (int, float)) or layer['size'] <= 0:
+            raise LayoutError(f'{where}: "size" must be a positive number')
+        if not isinstance(layer.get('max_width', 1), (int, float)) or layer.get('max_width', 1) <= 0:
+            raise LayoutError(f'{where}: "max_width" must be a positive number')
+        if not isinstance(layer.get('max_lines', 1), int) or layer.get('max_lines', 1) < 1:
+            raise LayoutError(f'{where}: "max_lines" must be a whole number of at least 1')
+        if not isinstance(layer.get('min_size', 1), (int, float)) or not 0 < layer.get('min_size', 1) <= layer['size']:
+            raise LayoutError(f'{where}: "min_size" must be a positive number no larger than "size"')
+        if not isinstance(layer.get('line_spacing', 1), (int, float)) or layer.get('line_spacing', 1) <= 0:
+            raise LayoutError(f'{where}: "line_spacing" must be a positive number')
+        if not isinstance(layer.get('padding', 0), (int, float)) or layer.get('padding', 0) < 0:
+            raise LayoutError(f'{where}: "padding" must be a non-negative number')
+        self._parse_color(layer.get('color', 'white'), palette, where)
+        if 'background' in layer:
+            self._parse_color(layer['background'], palette, where)
+
+    @staticmethod
+    def _require_numbers(layer, keys, where, optional=False):
+        """Raise LayoutError unless each key holds a number (optional keys may also be absent)"""
+        for key in keys:
+            if optional and key not in layer:
+                continue
+            value = layer.get(key)
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                raise LayoutError(f'{where}: "{key}" must be a number')
+
+    def _is_dynamic(self, layer):
+        """Whether a layer depends on the listing (field placeholders or when/unless conditions)"""
+        return bool(self._text_fields(layer.get('text', '')) or layer.get('when') or layer.get('unless'))
+
+    @staticmethod
+    def _text_fields(template):
+        try:
+            return [field.split('.')[0].split('[')[0] for _, field, _, _ in string.Formatter().parse(template) if field]
+        except ValueError as e:
+            raise LayoutError(f'bad text template {template!r}: {e}')
+
+    @staticmethod
+    def _parse_color(color, palette, where):
+        """RGBA tuple from "#hex", a color name, an [r, g, b(, a)] list, or "$name" from the layout palette"""
+        if isinstance(color, str) and color.startswith('$'):
+            if color[1:] not in palette:
+                raise LayoutError(f'{where}: unknown palette color {color}')
+            color = palette[color[1:]]
+        try:
+            if isinstance(color, str):
+                rgba = ImageColor.getrgb(color)
+            elif isinstance(color, list) and len(color) in (3, 4) and all(isinstance(c, int) and 0 <= c <= 255 for c in color):
+                rgba = tuple(color)
+            else:
+                raise ValueError(color)
+        except ValueError:
+            raise LayoutError(f'{where}: invalid color {color!r}')
+        return rgba if len(rgba) == 4 else rgba + (255,)
+
+    def _compile(self, name, format_type, width, height):
+        """Render plan for a layout at one output size (cached via self.plan)"""
+        spec = self.get(name)
+        palette = spec.get('colors', {})
+        scale = min(width / self.BASE_SIZE[0], height / self.BASE_SIZE[1])
+        sprites, texts = [], []
+
+        for layer in spec['layers']:
+            if layer.get('formats') and format_type not in layer['formats']:
+                continue
+
+            if layer['type'] == 'text' and self._is_dynamic(layer):
+                text = self._text_box(layer, palette, width, height, scale)
+                text.update({
+                    'text': layer['text'],
+                    'fields': self._text_fields(layer['text']),
+                    'when': layer.get('when', []),
+                    'unless': layer.get('unless', [])
+                })
+                texts.append(text)
+                continue
+
+            # Static layer: rendered now on a scratch canvas and cropped to what it covers
+            canvas = Image.new('RGBA', (width, height), (0, 0, 0, 0))
+            self._draw_static(canvas, layer, palette, width, height, scale)
+            bbox = canvas.getbbox()
+            if bbox:
+                sprites.append((canvas.crop(bbox), bbox[:2]))
+
+        return RenderPlan(spec['name'], width, height, tuple(sprites), tuple(texts))
+
+    def _draw_static(self, canvas, layer, palette, width, height, scale):
+        if layer['type'] == 'backdrop':
+            # scale_height false keeps height in output pixels, as the original templates drew it at every size
+            band_height = int(layer['height'] * scale) if layer.get('scale_height', True) else int(layer['height'])
+            band_height = max(1, min(band_height, int(height * layer.get('max_fraction', 1))))
+            r, g, b, _ = self._parse_color(layer.get('color', [0, 0, 0]), palette, 'backdrop')
+            max_alpha = layer.get('alpha', 255)
+            if layer.get('style') == 'gradient':
+                # Bottom-up fade from a precomputed alpha column stretched across the width
+                alpha_column = bytes(int(max_alpha * (i / band_height)) for i in range(band_height))
+                alpha = Image.frombytes('L', (1, band_height), alpha_column).resize((width, band_height), Image.NEAREST)
+                band = Image.new('RGBA', (width, band_height), (r, g, b, 0))
+                band.putalpha(alpha)
+            else:
+                band = Image.new('RGBA', (width, band_height), (r, g, b, max_alpha))
+            canvas.paste(band, (0, height - band_height))
+            return
+
+        draw = ImageDraw.Draw(canvas)
+        x, y, align = self._position(layer, width, height, scale)
+        if layer['type'] == 'box':
+            box_width, box_height = int(layer['width'] * scale), int(layer['height'] * scale)
+            left = {'l': x, 'm': x - box_width // 2, 'r': x - box_width}[align]
+            top = y - box_height if layer.get('anchor', 'top-left').startswith('bottom') else y
+            draw.rectangle([(left, top), (left + box_width, top + box_height)], fill=self._parse_color(layer['fill'], palette, 'box'))
+            if 'text' in layer:
+                # Label centred across the box, text_y units below its top edge
+                label = self._text_box(layer, palette, width, height, scale)
+                label.update({
+                    'position': (left + box_width // 2, top + int(layer.get('text_y', 0) * scale)),
+                    'anchor': 'ma',
+                    'max_width': box_width
+                })
+                self.draw_text(canvas, label, layer['text'])
+            return
+
+        self.draw_text(canvas, self._text_box(layer, palette, width, height, scale), layer['text'])
+
+    def draw_text(self, image, text_box, content):
+        """Fit content to a compiled text box and draw it, one line every line_spacing font heights"""
+        font, size, lines = self.text_layout.fit(
+            content, text_box['face'], text_box['size'], text_box['max_width'], text_box['max_lines'], text_box['min_size']
+        )
+        draw = ImageDraw.Draw(image)
+        x, y = text_box['position']
+        line_height = round(size * text_box['line_spacing'])
+        if text_box.get('background'):
+            # Panel sized to the fitted lines, blended onto the image
+            text_width = max(self.text_layout.measure(line, text_box['face'], size) for line in lines)
+            left = x - {'l': 0, 'm': text_width / 2, 'r': text_width}[text_box['anchor'][0]]
+            pad = text_box['padding']
+            box = [(left - pad, y - pad), (left + text_width + pad, y + (len(lines) - 1) * line_height + size + pad)]
+            ImageDraw.Draw(image, 'RGBA').rectangle(box, fill=text_box['background'])
+        for i, line in enumerate(lines):
+            self.text_layout.draw_line(image, draw, (x, y + i * line_height), line, text_box['face'], size, text_box['fill'], text_box['anchor'])
+
+    def _text_box(self, layer, palette, width, height, scale):
+        """Pixel geometry and font settings for a text layer. Without max_width, text may span the
+        output width minus the layer's x offset on both sides."""
+        x, y, align = self._position(layer, width, height, scale)
+        size = layer['size'] * scale
+        if 'max_width' in layer:
+            max_width = layer['max_width'] * scale
+        else:
+            max_width = width - 2 * abs(int(layer['x'] * scale))
+        return {
+            'position': (x, y),
+            'anchor': align + 'a',
+            'face': layer.get('font', 'regular'),
+            'size': max(1, int(size)),
+            'min_size': max(1, int(layer.get('min_size', layer['size'] * 0.6) * scale)),
+            'max_width': max(1, int(max_width)),
+            'max_lines': layer.get('max_lines', 1),
+            'line_spacing': layer.get('line_spacing', 1.2),
+            'fill': self._parse_color(layer.get('color', 'white'), palette, 'text'),
+            'background': self._parse_color(layer['background'], palette, 'text') if 'background' in layer else None,
+            'padding': int(layer.get('padding', 10) * scale)
+        }
+
+    @staticmethod
+    def _position(layer, width, height, scale):
+        """Pixel point for a layer's anchor and x/y offsets, plus its horizontal alignment (l, m or r)"""
+        vertical, horizontal = layer.get('anchor', 'top-left').split('-')
+        dx, dy = int(layer['x'] * scale), int(layer['y'] * scale)
+        y = height - dy if vertical == 'bottom' else dy
+        if horizontal == 'left':
+            return dx, y, 'l'
+        if horizontal == 'right':
+            return width - dx, y, 'r'
+        return width // 2 + dx, y, 'm'
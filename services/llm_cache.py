@@ -0,0 +1,133 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import closing, contextmanager
+
+
+class LLMCache:
+    def __init__(self, path=None, max_entries=None, max_bytes=None, ttl=None):
+        self.path = path or os.getenv('LLM_CACHE_PATH', 'cache/llm_cache.sqlite3')
+        self.max_entries = max_entries or int(os.getenv('LLM_CACHE_MAX_ENTRIES', 5000))
+        self.max_bytes = max_bytes or int(os.getenv('LLM_CACHE_MAX_BYTES', 50 * 1024 * 1024))
+        self.ttl = ttl if ttl is not None else int(os.getenv('LLM_CACHE_TTL', 30 * 24 * 3600))
+        self.enabled = os.getenv('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        if self.enabled:
+            try:
+                self._init_db()
+            except sqlite3.Error as e:
+                print(f"LLM cache disabled: {e}")
+                self.enabled = False
+
+    @staticmethod
+    def make_key(model, messages, temperature, max_tokens, **extra):
+        """Content address for a completion request: identical requests map to the same key"""
+        payload = {
+            'model': model,
+            'messages': messages,
+            'temperature': temperature,
+            'max_tokens': max_tokens,
+            **extra
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+    def get(self, key):
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        try:
+            with self._connect() as conn:
+                row = conn.execute('SELECT content, created_at FROM completions WHERE key = ?', (key,)).fetchone()
+                if row and now - row[1] <= self.ttl:
+                    conn.execute('UPDATE completions SET last_used = ? WHERE key = ?', (now, key))
+                    with self._lock:
+                        self.hits += 1
+                    return row[0]
+                if row:
+                    conn.execute('DELETE FROM completions WHERE key = ?', (key,))
+        except sqlite3.Error as e:
+            print(f"LLM cache read error: {e}")
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, content):
+        if not self.enabled or content is None:
+            return
+
+        now = time.time()
+        try:
+            with self._lock, self._connect() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO completions (key, content, size, created_at, last_used) VALUES (?, ?, ?, ?, ?)',
+                    (key, content, len(content.encode()), now, now)
+                )
+                self._evict(conn)
+        except sqlite3.Error as e:
+            print(f"LLM cache write error: {e}")
+
+    def stats(self):
+        entries, size = 0, 0
+        if self.enabled:
+            try:
+                with self._connect() as conn:
+                    entries, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions').fetchone()
+            except sqlite3.Error:
+                pass
+        return {
+            'enabled': self.enabled,
+            'entries': entries,
+            'bytes': size,
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+    def _evict(self, conn):
+        """Drop expired entries, then least recently used ones until under the entry and size bounds"""
+        conn.execute('DELETE FROM completions WHERE created_at < ?', (time.time() - self.ttl,))
+        entries, size = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions').fetchone()
+        if entries <= self.max_entries and size <= self.max_bytes:
+            return
+
+        excess_bytes = size - self.max_bytes
+        excess_entries = entries - self.max_entries
+        stale = []
+        for key, entry_size in conn.execute('SELECT key, size FROM completions ORDER BY last_used ASC'):
+            if excess_entries <= 0 and excess_bytes <= 0:
+                break
+            stale.append((key,))
+            excess_entries -= 1
+            excess_bytes -= entry_size
+        conn.executemany('DELETE FROM completions WHERE key = ?', stale)
+
+    @contextmanager
+    def _connect(self):
+        """Connection for one transaction: committed (or rolled back) and then closed"""
+        # sqlite3's own context manager only ends the transaction; it never closes the connection
+        with closing(sqlite3.connect(self.path, timeout=5)) as conn, conn:
+            yield conn
+
+    def _init_db(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS completions ('
+                'key TEXT PRIMARY KEY, content TEXT NOT NULL, size INTEGER NOT NULL, '
+                'created_at REAL NOT NULL, last_used REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_completions_last_used ON completions (last_used)')
+
+
+# Shared by every service that calls OpenAI, so identical prompts are answered once
+llm_cache = LLMCache()
@@ -1,74 +1,127 @@
-import requests
+from services.http_client import http_client
+from services.geocoder import Geocoder
+from services.amenity_index import AmenityIndex, METERS_PER_DEGREE
+from services.cache import TTLCache
 import os
+import math
 
 class MapsService:
-    def __init__(self, api_key=None):
+    def __init__(self, api_key=None, geocoder=None, amenity_index=None):
         self.api_key = api_key or os.getenv('GOOGLE_MAPS_API_KEY')
-        self.nominatim_url = 'https://nominatim.openstreetmap.org'
+        # Cached/offline geocoding; Nominatim is only asked for addresses it has never seen
+        self.geocoder = geocoder or Geocoder()
+        # Local amenity points (AMENITY_POINTS); Overpass is only queried outside the area they cover
+        self.amenities = amenity_index or AmenityIndex()
         self.overpass_url = 'https://overpass-api.de/api/interpreter'
+        # Overpass amenities per grid tile, so nearby listings share one upstream fetch
+        self.tile_degrees = float(os.getenv('OVERPASS_TILE_DEGREES', 0.02))
+        self.overpass_tiles = TTLCache(
+            max_entries=int(os.getenv('OVERPASS_TILE_CACHE_ENTRIES', 2000)),
+            max_bytes=int(os.getenv('OVERPASS_TILE_CACHE_BYTES', 64 * 1024 * 1024)),
+            default_ttl=int(os.getenv('OVERPASS_TILE_TTL', 24 * 3600))
+        )
     
     def get_neighborhood_insights(self, address):
         """Get neighborhood data using free OpenStreetMap APIs"""
         try:
-            # Use Nominatim for geocoding (free)
-            geocode_url = f"{self.nominatim_url}/search"
-            params = {
-                'q': address,
-                'format': 'json',
-                'limit': 1,
-                'addressdetails': 1
-            }
-            headers = {'User-Agent': 'RealEstateFlyerGenerator/1.0'}
-            
-            response = requests.get(geocode_url, params=params, headers=headers)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data:
-                    lat = float(data[0]['lat'])
-                    lon = float(data[0]['lon'])
-                    
-                    # Get nearby amenities using Overpass API (free)
-                    return self._get_overpass_data(lat, lon)
+            point = self.geocoder.geocode(address)
+            if point:
+                lat, lon = point
+                
+                if self.amenities.covers(lat, lon, radius=2000):
+                    counts, top_school = self.amenities.nearby(lat, lon, radius=2000)
+                    return self._summarize(counts['school'], counts['restaurant'], counts['park'], top_school)
+                
+                # Get nearby amenities using Overpass API (free)
+                return self._get_overpass_data(lat, lon)
         except Exception as e:
             print(f"OpenStreetMap API error: {e}")
         
         return self._get_realistic_data(address)
     
-    def _get_overpass_data(self, lat, lon):
+    def _get_overpass_data(self, lat, lon, radius=2000):
+        """Amenities within radius meters, merged from per-tile indexes of cached Overpass data.
+
+        Each tile is looked up single-flight, so concurrent requests for an uncached tile wait for one
+        fetch. That fetch covers every tile of this query still missing, in one bounding-box request.
+        """
         try:
-            query = f"""
-            [out:json][timeout:25];
-            (
-              node["amenity"="school"](around:2000,{lat},{lon});
-              node["amenity"="restaurant"](around:2000,{lat},{lon});
-              node["leisure"="park"](around:2000,{lat},{lon});
-            );
-            out geom;
-            """
+            tiles = self._tiles_around(lat, lon, radius)
             
-            response = requests.post(self.overpass_url, data=query)
+            def fetch(tile):
+                missing = [t for t in tiles if t == tile or self.overpass_tiles.get(t) is None]
+                fetched = self._fetch_tiles(missing)
+                return fetched[tile] if fetched else None
             
-            if response.status_code == 200:
-                data = response.json()
-                elements = data.get('elements', [])
-                
-                schools = [e for e in elements if e.get('tags', {}).get('amenity') == 'school']
-                restaurants = [e for e in elements if e.get('tags', {}).get('amenity') == 'restaurant']
-                parks = [e for e in elements if e.get('tags', {}).get('leisure') == 'park']
-                
-                return {
-                    'walkability_score': min(95, len(restaurants) * 3 + len(parks) * 5 + 40),
-                    'schools_nearby': len(schools),
-                    'restaurants_nearby': len(restaurants),
-                    'parks_nearby': len(parks),
-                    'top_school': schools[0]['tags'].get('name', 'Local School') if schools else 'Schools in area'
-                }
+            counts = dict.fromkeys(AmenityIndex.KINDS, 0)
+            top_school, top_school_distance = None, None
+            for tile in tiles:
+                index = self.overpass_tiles.get_or_set(tile, lambda tile=tile: fetch(tile))
+                if index is None:
+                    return self._get_realistic_data()
+                tile_counts, school, distance = index.nearby_with_distance(lat, lon, radius)
+                for kind, count in tile_counts.items():
+                    counts[kind] += count
+                if school and (top_school_distance is None or distance < top_school_distance):
+                    top_school, top_school_distance = school, distance
+            return self._summarize(counts['school'], counts['restaurant'], counts['park'], top_school)
         except Exception as e:
             print(f"Overpass API error: {e}")
         
         return self._get_realistic_data()
     
+    def _tiles_around(self, lat, lon, radius):
+        """(row, col) of every tile the circle overlaps"""
+        lat_span = radius / METERS_PER_DEGREE
+        lon_span = lat_span / max(math.cos(math.radians(lat)), 0.01)
+        rows = range(math.floor((lat - lat_span) / self.tile_degrees), math.floor((lat + lat_span) / self.tile_degrees) + 1)
+        cols = range(math.floor((lon - lon_span) / self.tile_degrees), math.floor((lon + lon_span) / self.tile_degrees) + 1)
+        return [(row, col) for row in rows for col in cols]
+    
+    def _fetch_tiles(self, tiles):
+        """Query Overpass for the box around the given tiles and cache an AmenityIndex for each; None if the request failed"""
+        size = self.tile_degrees
+        south, north = min(r for r, _ in tiles) * size, (max(r for r, _ in tiles) + 1) * size
+        west, east = min(c for _, c in tiles) * size, (max(c for _, c in tiles) + 1) * size
+        bbox = f"{south:.6f},{west:.6f},{north:.6f},{east:.6f}"
+        query = f"""
+        [out:json][timeout:25];
+        (
+          node["amenity"="school"]({bbox});
+          node["amenity"="restaurant"]({bbox});
+          node["leisure"="park"]({bbox});
+        );
+        out;
+        """
+        
+        response = http_client.post(self.overpass_url, data=query)
+        if response.status_code != 200:
+            print(f"Overpass API error: HTTP {response.status_code}")
+            return None
+        
+        points = {tile: [] for tile in tiles}
+        for element in response.json().get('elements', []):
+            tags = element.get('tags', {})
+            kind = next((kinds[tags[tag]] for tag, kinds in AmenityIndex.OSM_TAGS.items() if tags.get(tag) in kinds), None)
+            tile = (math.floor(element['lat'] / size), math.floor(element['lon'] / size)) if 'lat' in element else None
+            if kind and tile in points:
+                points[tile].append((kind, element['lat'], element['lon'], tags.get('name')))
+        # Indexed once here; queries against the tile reuse the grid
+        fetched = {tile: AmenityIndex(points=tile_points) for tile, tile_points in points.items()}
+        for tile, index in fetched.items():
+            self.overpass_tiles.set(tile, index)
+        return fetched
+    
+    @staticmethod
+    def _summarize(schools, restaurants, parks, top_school):
+        return {
+            'walkability_score': min(95, restaurants * 3 + parks * 5 + 40),
+            'schools_nearby': schools,
+            'restaurants_nearby': restaurants,
+            'parks_nearby': parks,
+            'top_school': top_school or ('Local School' if schools else 'Schools in area')
+        }
+    
     def _get_realistic_data(self, address=None):
         return {
             'walkability_score': 'Data unavailable',
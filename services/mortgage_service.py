@@ -1,4 +1,14 @@
+import numpy as np
+
+
 class MortgageService:
+    # Down payments shown in the flyer payment table
+    TABLE_DOWN_PAYMENTS = (10, 20, 30)
+    # Upper bounds for one scenario request
+    MAX_SCENARIOS = 500
+    MAX_TERM_YEARS = 40
+    MAX_BALANCE_YEARS = 10
+
     @staticmethod
     def calculate_mortgage(price, down_payment_percent=20, interest_rate=6.5, loan_term_years=30):
         """Calculate monthly mortgage payment and related info"""
@@ -6,22 +16,31 @@ class MortgageService:
             price_num = float(str(price).replace(',', '').replace('$', ''))
             down_payment = price_num * (down_payment_percent / 100)
             loan_amount = price_num - down_payment
-            
+
             # Monthly payment calculation
             monthly_rate = interest_rate / 100 / 12
             num_payments = loan_term_years * 12
-            
+
             if monthly_rate > 0:
                 monthly_payment = loan_amount * (monthly_rate * (1 + monthly_rate)**num_payments) / ((1 + monthly_rate)**num_payments - 1)
             else:
                 monthly_payment = loan_amount / num_payments
-            
+
+            # Same rate and term at other down payments, for the flyer's payment table
+            table_payments = MortgageService.monthly_payments(
+                price_num * (1 - np.array(MortgageService.TABLE_DOWN_PAYMENTS) / 100), interest_rate, loan_term_years
+            )
+
             return {
                 'monthly_payment': round(monthly_payment),
                 'down_payment': round(down_payment),
                 'loan_amount': round(loan_amount),
                 'interest_rate': f"{interest_rate}%",
-                'total_interest': round((monthly_payment * num_payments) - loan_amount)
+                'total_interest': round((monthly_payment * num_payments) - loan_amount),
+                'payment_table': [
+                    {'down_payment_percent': down, 'monthly_payment': int(payment)}
+                    for down, payment in zip(MortgageService.TABLE_DOWN_PAYMENTS, np.rint(table_payments))
+                ]
             }
         except:
             return {
@@ -29,5 +48,134 @@ class MortgageService:
                 'down_payment': 0,
                 'loan_amount': 0,
                 'interest_rate': "6.5%",
-                'total_interest': 0
-            }
\ No newline at end of file
+                'total_interest': 0,
+                'payment_table': []
+            }
+
+    @staticmethod
+    def monthly_payments(loan_amounts, interest_rates, loan_term_years):
+        """Level monthly payments; arguments are scalars or arrays broadcast against each other"""
+        loan = np.asarray(loan_amounts, dtype=float)
+        rate = np.asarray(interest_rates, dtype=float) / 100 / 12
+        months = np.asarray(loan_term_years, dtype=float) * 12
+        # Zero-rate loans divide evenly; the annuity formula would be 0/0 for them
+        safe_rate = np.where(rate > 0, rate, 1.0)
+        growth = (1 + safe_rate) ** months
+        return np.where(rate > 0, loan * safe_rate * growth / (growth - 1), loan / months)
+
+    @staticmethod
+    def amortization_schedules(loan_amounts, interest_rates, loan_term_years):
+        """Month-by-month schedules for many loans at once.
+
+        Arguments are 1-D arrays (or scalars) of equal length. Returns the payments and a dict of
+        (loans x months) arrays: interest, principal and remaining balance. The months axis runs to
+        the longest term, and months after a loan is paid off are zero.
+        """
+        loan, rate_percent, years = np.broadcast_arrays(
+            np.atleast_1d(np.asarray(loan_amounts, dtype=float)),
+            np.atleast_1d(np.asarray(interest_rates, dtype=float)),
+            np.atleast_1d(np.asarray(loan_term_years, dtype=float))
+        )
+        payment = MortgageService.monthly_payments(loan, rate_percent, years)
+        rate = (rate_percent / 100 / 12)[:, None]
+        months = (years * 12).astype(int)[:, None]
+        k = np.arange(0, months.max() + 1)[None, :]
+
+        # Closed-form balance after k payments, for every loan and month in one pass
+        safe_rate = np.where(rate > 0, rate, 1.0)
+        growth = (1 + safe_rate) ** k
+        balance = np.where(
+            rate > 0,
+            loan[:, None] * growth - payment[:, None] * (growth - 1) / safe_rate,
+            loan[:, None] - payment[:, None] * k
+        )
+        balance = np.where(k <= months, np.clip(balance, 0, None), 0)
+
+        interest = balance[:, :-1] * rate
+        principal = balance[:, :-1] - balance[:, 1:]
+        active = k[:, 1:] <= months
+        return payment, {
+            'interest': np.where(active, interest, 0),
+            'principal': np.where(active, principal, 0),
+            'balance': balance[:, 1:]
+        }
+
+    def scenario_grid(self, price, down_payment_percents, interest_rates, loan_term_years, balance_years=(5, 10)):
+        """Payments for every down payment x rate x term combination, computed as one array.
+
+        Matrices are nested lists indexed [down payment][rate][term]. remaining_balance gives the
+        balance left after each of balance_years, from the scenarios' full amortization schedules.
+        """
+        price_num = float(str(price).replace(',', '').replace('$', ''))
+        down = np.asarray(down_payment_percents, dtype=float)
+        rates = np.asarray(interest_rates, dtype=float)
+        terms = np.asarray(loan_term_years, dtype=float)
+        years = np.asarray(balance_years, dtype=float)
+        self._validate_scenarios(price_num, down, rates, terms, years)
+
+        shape = (down.size, rates.size, terms.size)
+        loan_grid = np.broadcast_to((price_num * (1 - down / 100))[:, None, None], shape)
+        rate_grid = np.broadcast_to(rates[None, :, None], shape)
+        term_grid = np.broadcast_to(terms[None, None, :], shape)
+
+        payment, schedule = self.amortization_schedules(loan_grid.ravel(), rate_grid.ravel(), term_grid.ravel())
+        total_interest = schedule['interest'].sum(axis=1)
+        remaining = {
+            str(year): np.rint(schedule['balance'][:, min(year * 12, schedule['balance'].shape[1]) - 1]).reshape(shape).astype(int).tolist()
+            for year in years.astype(int).tolist()
+        }
+
+        return {
+            'price': round(price_num),
+            'down_payment_percents': down.tolist(),
+            'interest_rates': rates.tolist(),
+            'loan_term_years': terms.astype(int).tolist(),
+            'loan_amounts': np.rint(price_num * (1 - down / 100)).astype(int).tolist(),
+            'monthly_payment': np.rint(payment).reshape(shape).astype(int).tolist(),
+            'total_interest': np.rint(total_interest).reshape(shape).astype(int).tolist(),
+            'remaining_balance': remaining
+        }
+
+    def amortization_schedule(self, price, down_payment_percent=20, interest_rate=6.5, loan_term_years=30):
+        """Monthly and yearly amortization for one scenario"""
+        price_num = float(str(price).replace(',', '').replace('$', ''))
+        self._validate_scenarios(price_num, np.array([down_payment_percent], dtype=float), np.array([interest_rate], dtype=float), np.array([loan_term_years], dtype=float))
+        loan_amount = price_num * (1 - down_payment_percent / 100)
+        payment, schedule = self.amortization_schedules(loan_amount, interest_rate, loan_term_years)
+        months = int(loan_term_years * 12)
+        interest, principal, balance = (np.round(schedule[name][0, :months], 2) for name in ('interest', 'principal', 'balance'))
+        yearly_interest = interest.reshape(-1, 12).sum(axis=1)
+        yearly_principal = principal.reshape(-1, 12).sum(axis=1)
+
+        return {
+            'loan_amount': round(loan_amount),
+            'monthly_payment': round(float(payment[0]), 2),
+            'total_interest': round(float(interest.sum())),
+            'monthly': [
+                {'month': i + 1, 'interest': float(interest[i]), 'principal': float(principal[i]), 'balance': float(balance[i])}
+                for i in range(months)
+            ],
+            'yearly': [
+                {'year': i + 1, 'interest': round(float(yearly_interest[i])), 'principal': round(float(yearly_principal[i])), 'balance': round(float(balance[(i + 1) * 12 - 1]))}
+                for i in range(len(yearly_interest))
+            ]
+        }
+
+    def _validate_scenarios(self, price, down, rates, terms, balance_years=None):
+        """Raise ValueError unless the scenario inputs are sane and the grid is within MAX_SCENARIOS"""
+        balance_years = np.empty(0) if balance_years is None else balance_years
+        # NaN and Infinity pass every comparison below (Flask's JSON parser accepts them)
+        if not all(np.isfinite(values).all() for values in (price, down, rates, terms, balance_years)):
+            raise ValueError('Scenario inputs must be finite numbers')
+        if down.ndim != 1 or rates.ndim != 1 or terms.ndim != 1 or not (down.size and rates.size and terms.size):
+            raise ValueError('down_payment_percents, interest_rates and loan_term_years must be non-empty lists of numbers')
+        if down.size * rates.size * terms.size > self.MAX_SCENARIOS:
+            raise ValueError(f'At most {self.MAX_SCENARIOS} scenarios per request')
+        if not price > 0 or (down < 0).any() or (down >= 100).any() or (rates < 0).any() or (rates > 30).any():
+            raise ValueError('price must be positive, down payments in [0, 100) and rates in [0, 30]')
+        if (terms < 1).any() or (terms > self.MAX_TERM_YEARS).any() or (terms % 1).any():
+            raise ValueError(f'loan_term_years must be whole years from 1 to {self.MAX_TERM_YEARS}')
+        if balance_years.ndim != 1 or balance_years.size > self.MAX_BALANCE_YEARS:
+            raise ValueError(f'balance_years must be a list of at most {self.MAX_BALANCE_YEARS} years')
+        if (balance_years < 1).any() or (balance_years > self.MAX_TERM_YEARS).any() or (balance_years % 1).any():
+            raise ValueError(f'balance_years must be whole years from 1 to {self.MAX_TERM_YEARS}')
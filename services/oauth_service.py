@@ -1,5 +1,5 @@
 import os
-import requests
+from services.http_client import http_client
 from urllib.parse import urlencode
 from flask import session, url_for
 import json
@@ -34,7 +34,7 @@ class OAuthService:
     def exchange_facebook_code(self, code, redirect_uri):
         """Exchange Facebook authorization code for access token"""
         try:
-            response = requests.post('https://graph.facebook.com/v18.0/oauth/access_token', data={
+            response = http_client.post('https://graph.facebook.com/v18.0/oauth/access_token', data={
                 'client_id': self.facebook_client_id,
                 'client_secret': self.facebook_client_secret,
                 'redirect_uri': redirect_uri,
@@ -48,7 +48,7 @@ class OAuthService:
     def exchange_linkedin_code(self, code, redirect_uri):
         """Exchange LinkedIn authorization code for access token"""
         try:
-            response = requests.post('https://www.linkedin.com/oauth/v2/accessToken', data={
+            response = http_client.post('https://www.linkedin.com/oauth/v2/accessToken', data={
                 'grant_type': 'authorization_code',
                 'code': code,
                 'redirect_uri': redirect_uri,
@@ -63,7 +63,7 @@ class OAuthService:
     def get_facebook_pages(self, access_token):
         """Get user's Facebook pages"""
         try:
-            response = requests.get(f'https://graph.facebook.com/v18.0/me/accounts?access_token={access_token}')
+            response = http_client.get(f'https://graph.facebook.com/v18.0/me/accounts?access_token={access_token}')
             return response.json().get('data', [])
         except Exception as e:
             print(f"Facebook pages error: {e}")
@@ -74,7 +74,7 @@ class OAuthService:
         try:
             # Upload photo
             with open(image_path, 'rb') as image_file:
-                response = requests.post(
+                response = http_client.post(
                     f'https://graph.facebook.com/v18.0/{page_id}/photos',
                     data={'message': message},
                     files={'source': image_file},
@@ -89,7 +89,7 @@ class OAuthService:
         """Post to LinkedIn with image"""
         try:
             # Get user profile
-            profile_response = requests.get(
+            profile_response = http_client.get(
                 'https://api.linkedin.com/v2/people/~',
                 headers={'Authorization': f'Bearer {access_token}'}
             )
@@ -108,7 +108,7 @@ class OAuthService:
                 'visibility': {'com.linkedin.ugc.MemberNetworkVisibility': 'PUBLIC'}
             }
             
-            response = requests.post(
+            response = http_client.post(
                 'https://api.linkedin.com/v2/ugcPosts',
                 headers={
                     'Authorization': f'Bearer {access_token}',
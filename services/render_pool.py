@@ -0,0 +1,137 @@
+import os
+import io
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from PIL import Image
+from services.flyer_generator import FlyerGenerator
+
+
+class RenderQueueFull(Exception):
+    """Every render worker is busy and the wait queue is full"""
+
+
+# Per-process generator, created once when a worker starts
+_worker_generator = None
+
+
+def _init_worker():
+    global _worker_generator
+    _worker_generator = FlyerGenerator()
+
+
+def _render_job(image_payload, render_args, output_format, prescale=None):
+    image = RenderPool.decode_image(image_payload)
+    if prescale:
+        # Decoded once per worker for all variants of a batch that land on it
+        image = _worker_generator.prescaled_source(image, *prescale)
+    data, _, _ = _worker_generator.create_flyer_bytes(image, *render_args, output_format=output_format)
+    return data
+
+
+class RenderPool:
+    def __init__(self, workers=None, queue_size=None, queue_timeout=None):
+        default_workers = min(4, os.cpu_count() or 1)
+        self.workers = workers if workers is not None else int(os.getenv('RENDER_WORKERS', default_workers))
+        self.queue_size = queue_size if queue_size is not None else int(os.getenv('RENDER_QUEUE_SIZE', self.workers * 4))
+        self.queue_timeout = queue_timeout if queue_timeout is not None else float(os.getenv('RENDER_QUEUE_TIMEOUT', 2))
+        # One slot per running or waiting job; a request that cannot get one is turned away
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size) if self.workers > 0 else None
+        self._executor = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.rejected = 0
+        self.failed = 0
+
+    @property
+    def enabled(self):
+        return self._slots is not None
+
+    def submit(self, image, render_args, output_format, prescale=None):
+        """Queue a flyer render and return a Future of its encoded bytes.
+
+        render_args are FlyerGenerator.create_flyer_bytes' arguments after the image; prescale is an
+        optional (width, height) the worker shrinks the source to first. Raises RenderQueueFull if no
+        slot frees up within queue_timeout seconds.
+        """
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self.rejected += 1
+            raise RenderQueueFull(f'All {self.workers} render workers busy and {self.queue_size} jobs queued')
+
+        try:
+            future = self._get_executor().submit(_render_job, self.encode_image(image), render_args, output_format, prescale)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.submitted += 1
+        future.add_done_callback(self._job_done)
+        return future
+
+    def render(self, image, render_args, output_format):
+        """Render on a worker and wait for the encoded bytes"""
+        return self.submit(image, render_args, output_format).result()
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'queue_size': self.queue_size,
+            'submitted': self.submitted,
+            'rejected': self.rejected,
+            'failed': self.failed
+        }
+
+    def _job_done(self, future):
+        self._slots.release()
+        error = future.exception()
+        if error is not None:
+            with self._lock:
+                self.failed += 1
+            if isinstance(error, BrokenProcessPool):
+                print(f"Render pool broken, restarting workers: {error}")
+                with self._lock:
+                    self._executor = None
+
+    def _get_executor(self):
+        # Started on first use so importing the app (or the dev server's reloader) does not start workers.
+        # Spawned rather than forked: forking a threaded server can copy locks held by other threads
+        # (HTTP pools, SQLite, the OpenAI executor) into the child in a locked state.
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'), initializer=_init_worker
+                )
+            return self._executor
+
+    @staticmethod
+    def encode_image(image):
+        """Picklable form of a source image: the original file bytes or spooled file path when known,
+        otherwise raw pixels"""
+        source_bytes = image.info.get('source_bytes')
+        if source_bytes:
+            return ('encoded', source_bytes, image.info.get('source_digest'))
+        if image.info.get('source_path'):
+            return ('path', image.info['source_path'], image.info.get('source_digest'))
+        if image.mode not in ('RGB', 'RGBA', 'L'):
+            image = image.convert('RGBA')
+        return ('raw', image.mode, image.size, image.tobytes(), image.info.get('source_digest'))
+
+    @staticmethod
+    def decode_image(payload):
+        if payload[0] == 'encoded':
+            _, source_bytes, digest = payload
+            image = Image.open(io.BytesIO(source_bytes))
+            image.info['source_bytes'] = source_bytes
+        elif payload[0] == 'path':
+            _, source_path, digest = payload
+            image = Image.open(source_path)
+            image.info['source_path'] = source_path
+        else:
+            _, mode, size, pixels, digest = payload
+            image = Image.frombytes(mode, size, pixels)
+        if digest:
+            image.info['source_digest'] = digest
+        return image
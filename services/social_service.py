@@ -1,4 +1,4 @@
-import requests
+from services.http_client import http_client
 import os
 import base64
 
@@ -24,7 +24,7 @@ class SocialService:
                     'access_token': self.facebook_token
                 }
                 
-                response = requests.post(url, files=files, data=data)
+                response = http_client.post(url, files=files, data=data)
                 if response.status_code == 200:
                     return {'status': 'success', 'post_id': response.json().get('id')}
         except Exception as e:
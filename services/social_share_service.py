@@ -39,7 +39,8 @@ class SocialShareService:
             # Attach flyer image
             with open(flyer_path, 'rb') as f:
                 img = MIMEImage(f.read())
-                img.add_header('Content-Disposition', 'attachment', filename='property_flyer.png')
+                extension = os.path.splitext(flyer_path)[1] or '.png'
+                img.add_header('Content-Disposition', 'attachment', filename=f'property_flyer{extension}')
                 msg.attach(img)
             
             # Send email
@@ -0,0 +1,59 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+class TaskRunner:
+    def __init__(self, max_workers=8):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='task-runner')
+
+    def run(self, tasks):
+        """Run named tasks concurrently, starting each one as soon as its dependencies finish.
+
+        `tasks` maps a name to `(func, deps)`. `func` is called with the results of
+        its dependencies as keyword arguments. Returns `(results, timings)` where
+        timings are wall-clock milliseconds per task.
+        """
+        for name, (func, deps) in tasks.items():
+            missing = [dep for dep in deps if dep not in tasks]
+            if missing:
+                raise ValueError(f"Task '{name}' depends on unknown task(s): {', '.join(missing)}")
+
+        results = {}
+        timings = {}
+        pending = dict(tasks)
+        running = {}
+        error = None
+
+        while pending or running:
+            if error is None:
+                for name in [n for n, (_, deps) in pending.items() if all(d in results for d in deps)]:
+                    func, deps = pending.pop(name)
+                    kwargs = {dep: results[dep] for dep in deps}
+                    running[self.executor.submit(self._timed, func, kwargs)] = name
+            else:
+                pending.clear()
+
+            if not running:
+                if pending:
+                    raise ValueError(f"Circular task dependencies: {', '.join(pending)}")
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name], timings[name] = future.result()
+                except Exception as e:
+                    if error is None:
+                        error = e
+
+        if error is not None:
+            raise error
+
+        return results, timings
+
+    @staticmethod
+    def _timed(func, kwargs):
+        started = time.perf_counter()
+        result = func(**kwargs)
+        return result, round((time.perf_counter() - started) * 1000, 1)
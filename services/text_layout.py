@@ -0,0 +1,143 @@
+import threading
+from functools import lru_cache
+
+
+class TextLayout:
+    """Measures, wraps and fits text to a box without test-rendering it.
+
+    Widths are sums of glyph advances cached per (face, size), so measuring a string costs dictionary
+    lookups after the first time each character is seen. Complete layouts are memoized, since the same
+    addresses and headlines come back across formats and re-renders. Emoji are measured and drawn
+    through the EmojiRenderer, or dropped when it has no glyph for them.
+    """
+
+    ELLIPSIS = '…'
+
+    def __init__(self, font_registry, emoji_renderer=None, cache_size=2048):
+        self.fonts = font_registry
+        self.emoji = emoji_renderer
+        self._advances = {}
+        self._lock = threading.Lock()
+        self.fit = lru_cache(maxsize=cache_size)(self._fit)
+
+    def measure(self, text, face, size):
+        """Width of a single line in pixels"""
+        if self.emoji and not text.isascii():
+            return sum(self.emoji.advance(size) if is_emoji else self._measure_text(run, face, size) for is_emoji, run in self.emoji.split(text))
+        return self._measure_text(text, face, size)
+
+    def draw_line(self, image, draw, position, line, face, size, fill, anchor):
+        """Draw one fitted line, compositing emoji glyphs between the text runs.
+
+        Emoji come from the renderer's in-memory glyph cache. Each is sized to the font and centred
+        on the line.
+        """
+        font = self.fonts.get(face, size)
+        if not self.emoji or line.isascii():
+            draw.text(position, line, fill=fill, font=font, anchor=anchor)
+            return
+
+        # Runs are drawn left to right, so resolve centre and right alignment to a left edge first
+        x, y = position
+        x -= {'l': 0, 'm': self.measure(line, face, size) / 2, 'r': self.measure(line, face, size)}[anchor[0]]
+        anchor = 'l' + anchor[1]
+        _, line_top, _, line_bottom = font.getbbox('Hg', anchor=anchor)
+        for is_emoji, run in self.emoji.split(line):
+            if not is_emoji:
+                draw.text((x, y), run, fill=fill, font=font, anchor=anchor)
+                x += self._measure_text(run, face, size)
+                continue
+            glyph = self.emoji.glyph(run, int(size))
+            if glyph is not None:
+                image.paste(glyph, (int(x), int(y + (line_top + line_bottom - glyph.height) / 2)), glyph)
+            x += self.emoji.advance(size)
+
+    def _measure_text(self, text, face, size):
+        advances = self._advance_table(face, size)
+        width = 0
+        for char in text:
+            advance = advances.get(char)
+            if advance is None:
+                advance = advances[char] = self.fonts.get(face, size).getlength(char)
+            width += advance
+        return width
+
+    def wrap(self, text, face, size, max_width):
+        """Greedy word wrap into lines no wider than max_width; words wider than a line are split"""
+        space = self.measure(' ', face, size)
+        lines = []
+        for paragraph in text.split('\n'):
+            if self.measure(paragraph, face, size) <= max_width:
+                # Fits as written, spacing included
+                lines.append(paragraph)
+                continue
+            line, line_width = '', 0
+            for word in paragraph.split():
+                word_width = self.measure(word, face, size)
+                if line and line_width + space + word_width <= max_width:
+                    line, line_width = f'{line} {word}', line_width + space + word_width
+                    continue
+                if line:
+                    lines.append(line)
+                while word_width > max_width and len(word) > 1:
+                    head = self._prefix_that_fits(word, face, size, max_width)
+                    lines.append(head)
+                    word = word[len(head):]
+                    word_width = self.measure(word, face, size)
+                line, line_width = word, word_width
+            lines.append(line)
+        return lines
+
+    def _fit(self, text, face, size, max_width, max_lines=1, min_size=None):
+        """Largest font size from size down to min_size at which text wraps into max_lines.
+
+        Returns (font, size, lines). If even min_size needs more lines, the text is cut after
+        max_lines with an ellipsis. Called through self.fit, which memoizes the result.
+        """
+        if self.emoji:
+            text = self.emoji.prepare(text)
+        size, min_size = int(size), int(min_size or size)
+        while True:
+            lines = self.wrap(text, face, size, max_width)
+            if len(lines) <= max_lines or size <= min_size:
+                break
+            # Widths scale with the font size and wrapping only wastes space, so no size much above the
+            # one whose total width equals max_lines full lines can fit: jump there, then step down.
+            # The slack covers hinted advances not scaling exactly linearly.
+            total_width = self.measure(text.replace('\n', ' '), face, size)
+            upper_bound = int(size * max_lines * max_width / total_width * 1.04) if total_width else size
+            size = max(min_size, min(size - 1, upper_bound))
+
+        if len(lines) > max_lines:
+            lines = lines[:max_lines]
+            lines[-1] = self._prefix_that_fits(lines[-1], face, size, max_width, suffix=self.ELLIPSIS)
+        return self.fonts.get(face, size), size, tuple(lines)
+
+    def _prefix_that_fits(self, text, face, size, max_width, suffix=''):
+        """Longest prefix of text (plus suffix) no wider than max_width, at least one character"""
+        budget = max_width - self.measure(suffix, face, size)
+        width, end = 0, 0
+        for char in text:
+            width += self.measure(char, face, size)
+            if width > budget:
+                break
+            end += 1
+        prefix = text[:max(end, 1)]
+        return prefix.rstrip() + suffix if suffix else prefix
+
+    def _advance_table(self, face, size):
+        key = (face, int(size))
+        table = self._advances.get(key)
+        if table is None:
+            with self._lock:
+                table = self._advances.setdefault(key, {})
+        return table
+
+    def stats(self):
+        info = self.fit.cache_info()
+        return {
+            'layouts': {'hits': info.hits, 'misses': info.misses, 'size': info.currsize},
+            'fonts_measured': len(self._advances),
+            'glyphs_cached': sum(len(table) for table in self._advances.values()),
+            'emoji': self.emoji.stats() if self.emoji else None
+        }
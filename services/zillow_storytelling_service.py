@@ -1,8 +1,11 @@
-import requests
+from services.http_client import http_client
 import os
 import json
 import re
+import copy
 from dotenv import load_dotenv
+from services.cache import TTLCache, normalize_address
+from services.llm_cache import llm_cache
 
 load_dotenv()
 
@@ -11,6 +14,32 @@ class ZillowStorytellingService:
         self.rapidapi_key = os.getenv('RAPIDAPI_KEY')
         self.openai_api_key = os.getenv('OPENAI_API_KEY')
         
+        # Address-keyed cache in front of the RapidAPI lookups, with a TTL per data type
+        self.cache = TTLCache(
+            max_entries=int(os.getenv('ZILLOW_CACHE_MAX_ENTRIES', 2000)),
+            max_bytes=int(os.getenv('ZILLOW_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+        )
+        self.cache_ttls = {
+            'property': int(os.getenv('ZILLOW_CACHE_TTL_PROPERTY', 3600)),
+            'comparables': int(os.getenv('ZILLOW_CACHE_TTL_COMPARABLES', 6 * 3600)),
+            'neighborhood': int(os.getenv('ZILLOW_CACHE_TTL_NEIGHBORHOOD', 24 * 3600)),
+            'insights': int(os.getenv('ZILLOW_CACHE_TTL_INSIGHTS', 3600)),
+            'bundle': int(os.getenv('ZILLOW_CACHE_TTL_BUNDLE', 3600))
+        }
+        
+    def _cached(self, data_type, address, fetch):
+        """Serve a lookup from the address cache, calling `fetch` on a miss (None results are not cached)"""
+        def fetch_safely():
+            try:
+                return fetch()
+            except Exception as e:
+                print(f"Zillow {data_type} error: {e}")
+                return None
+        
+        key = (data_type, normalize_address(address))
+        value = self.cache.get_or_set(key, fetch_safely, self.cache_ttls[data_type])
+        return copy.deepcopy(value)
+    
     def parse_zillow_url(self, zillow_url):
         """Extract property ID and get full data from Zillow URL"""
         # Extract property ID from URL patterns
@@ -46,7 +75,7 @@ class ZillowStorytellingService:
             url = f"https://zillow-com1.p.rapidapi.com/property"
             params = {"zpid": property_id}
             
-            response = requests.get(url, headers=headers, params=params)
+            response = http_client.get(url, headers=headers, params=params)
             if response.status_code == 200:
                 return self._format_property_data(response.json())
         except Exception as e:
@@ -58,34 +87,26 @@ class ZillowStorytellingService:
         """Get neighborhood data from Zillow via RapidAPI"""
         if not self.rapidapi_key:
             return self._get_mock_neighborhood_data(address)
-            
-        headers = {
-            "X-RapidAPI-Key": self.rapidapi_key,
-            "X-RapidAPI-Host": "zillow-com1.p.rapidapi.com"
-        }
         
-        try:
-            search_url = "https://zillow-com1.p.rapidapi.com/propertyExtendedSearch"
-            search_params = {"location": address, "status_type": "ForSale"}
-            
-            response = requests.get(search_url, headers=headers, params=search_params)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('props'):
-                    return self._extract_neighborhood_insights(data['props'][0])
-            
-        except Exception as e:
-            print(f"Zillow API error: {e}")
-            
-        return self._get_mock_neighborhood_data(address)
+        return self._cached('neighborhood', address, lambda: self._fetch_neighborhood_data(address)) or self._get_mock_neighborhood_data(address)
+    
+    def _fetch_neighborhood_data(self, address):
+        subject = self._get_bundle_subject(address)
+        return self._extract_neighborhood_insights(subject) if subject else None
     
     def _extract_neighborhood_insights(self, property_data):
         """Extract neighborhood insights from Zillow property data"""
+        address = property_data.get('address')
+        neighborhood_name = address.get('neighborhood') if isinstance(address, dict) else None
+        
+        # Detail records list schools as objects; the story prompt expects names
+        schools = [s.get('name') if isinstance(s, dict) else s for s in property_data.get('schools') or []]
+        schools = [s for s in schools if s]
+        
         return {
-            'neighborhood_name': property_data.get('address', {}).get('neighborhood', 'Great Neighborhood'),
+            'neighborhood_name': neighborhood_name or 'Great Neighborhood',
             'walkability': property_data.get('walkScore', 85),
-            'schools': property_data.get('schools', ['Excellent Schools']),
+            'schools': schools or ['Excellent Schools'],
             'year_built': property_data.get('yearBuilt', '2010')
         }
     
@@ -105,7 +126,7 @@ class ZillowStorytellingService:
             'year_built': '2010'
         }
     
-    def generate_neighborhood_story(self, address, story_type='balanced'):
+    def generate_neighborhood_story(self, address, story_type='balanced', regenerate=False):
         """AI generates compelling neighborhood narrative with variations"""
         neighborhood_data = self.get_neighborhood_data(address)
         
@@ -138,24 +159,37 @@ Generate JSON with:
 4. emotional_hook (1 sentence that creates desire)
 """
         
+        payload = {
+            'model': 'gpt-3.5-turbo',
+            'messages': [{'role': 'user', 'content': prompt}],
+            'max_tokens': 250,
+            'temperature': 0.8
+        }
+        
+        # Identical neighborhood facts and style reuse the stored story unless asked to regenerate
+        cache_key = llm_cache.make_key(payload['model'], payload['messages'], payload['temperature'], payload['max_tokens'])
+        cached = None if regenerate else llm_cache.get(cache_key)
+        if cached is not None:
+            try:
+                return json.loads(cached)
+            except ValueError:
+                pass
+        
         try:
-            response = requests.post(
+            response = http_client.post(
                 'https://api.openai.com/v1/chat/completions',
                 headers={
                     'Authorization': f'Bearer {self.openai_api_key}',
                     'Content-Type': 'application/json'
                 },
-                json={
-                    'model': 'gpt-3.5-turbo',
-                    'messages': [{'role': 'user', 'content': prompt}],
-                    'max_tokens': 250,
-                    'temperature': 0.8
-                }
+                json=payload
             )
             
             if response.status_code == 200:
                 content = response.json()['choices'][0]['message']['content']
-                return json.loads(content)
+                story = json.loads(content)
+                llm_cache.set(cache_key, content)
+                return story
             else:
                 print(f"OpenAI API error: {response.status_code}")
                 return self._generate_mock_story(neighborhood_data)
@@ -183,11 +217,12 @@ Generate JSON with:
         
         return variations
     
-    def get_property_data(self, address):
-        """Get detailed property data for AI agent"""
-        if not self.rapidapi_key:
-            return self._get_mock_property_data(address)
-            
+    def _get_property_bundle(self, address):
+        """Search for an address once and fetch its zpid detail once; all derived views read from this bundle"""
+        key = ('bundle', normalize_address(address))
+        return self.cache.get_or_set(key, lambda: self._fetch_property_bundle(address), self.cache_ttls['bundle'])
+    
+    def _fetch_property_bundle(self, address):
         headers = {
             "X-RapidAPI-Key": self.rapidapi_key,
             "X-RapidAPI-Host": "zillow-com1.p.rapidapi.com"
@@ -195,45 +230,99 @@ Generate JSON with:
         
         try:
             search_url = "https://zillow-com1.p.rapidapi.com/propertyExtendedSearch"
-            search_params = {"location": address, "status_type": "ForSale"}
+            search_params = {"location": address}
             
-            response = requests.get(search_url, headers=headers, params=search_params)
+            response = http_client.get(search_url, headers=headers, params=search_params)
+            if response.status_code != 200:
+                return None
             
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('props'):
-                    return self._format_property_data(data['props'][0])
+            search_data = response.json()
+            if not isinstance(search_data, dict):
+                return None
+            
+            # An exact address match returns the property itself; otherwise a list of props
+            props = search_data.get('props') or []
+            zpid = search_data.get('zpid') or (props[0].get('zpid') if props and isinstance(props[0], dict) else None)
+            
+            detail_data = None
+            if zpid:
+                detail_url = "https://zillow-com1.p.rapidapi.com/property"
+                detail_response = http_client.get(detail_url, headers=headers, params={"zpid": zpid})
+                if detail_response.status_code == 200 and isinstance(detail_response.json(), dict):
+                    detail_data = detail_response.json()
+            
+            return {'search': search_data, 'detail': detail_data}
             
         except Exception as e:
             print(f"Zillow API error: {e}")
             
-        return self._get_mock_property_data(address)
+        return None
+    
+    def _get_bundle_subject(self, address):
+        """The raw record for the searched property, preferring the richer detail response"""
+        bundle = self._get_property_bundle(address)
+        if not bundle:
+            return None
+        if bundle['detail']:
+            return bundle['detail']
+        if bundle['search'].get('zpid'):
+            return bundle['search']
+        props = bundle['search'].get('props') or []
+        return props[0] if props and isinstance(props[0], dict) else None
+    
+    def get_property_data(self, address):
+        """Get detailed property data for AI agent"""
+        if not self.rapidapi_key:
+            return self._get_mock_property_data(address)
+        
+        return self._cached('property', address, lambda: self._fetch_property_data(address)) or self._get_mock_property_data(address)
+    
+    def _fetch_property_data(self, address):
+        subject = self._get_bundle_subject(address)
+        return self._format_property_data(subject) if subject else None
     
     def get_comparable_properties(self, address):
         """Get comparable properties for CMA analysis"""
         if not self.rapidapi_key:
             return self._get_mock_comparables(address)
-            
+        
+        return self._cached('comparables', address, lambda: self._fetch_comparable_properties(address)) or self._get_mock_comparables(address)
+    
+    def _fetch_comparable_properties(self, address):
+        """Recently sold homes around the address: a CMA values the subject against sale prices, not asking prices"""
         headers = {
             "X-RapidAPI-Key": self.rapidapi_key,
             "X-RapidAPI-Host": "zillow-com1.p.rapidapi.com"
         }
         
-        try:
-            search_url = "https://zillow-com1.p.rapidapi.com/propertyExtendedSearch"
-            search_params = {"location": address, "status_type": "RecentlySold"}
-            
-            response = requests.get(search_url, headers=headers, params=search_params)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('props'):
-                    return [self._format_property_data(prop) for prop in data['props'][:5]]
-            
-        except Exception as e:
-            print(f"Zillow API error: {e}")
-            
-        return self._get_mock_comparables(address)
+        search_url = "https://zillow-com1.p.rapidapi.com/propertyExtendedSearch"
+        response = http_client.get(search_url, headers=headers, params={"location": address, "status_type": "RecentlySold"})
+        search_data = response.json() if response.status_code == 200 else None
+        candidates = list(search_data.get('props') or []) if isinstance(search_data, dict) else []
+        
+        # Sold homes Zillow lists alongside the detail record; active listings would be priced at asking
+        bundle = self._get_property_bundle(address)
+        if bundle and bundle['detail']:
+            candidates += [prop for prop in bundle['detail'].get('comps') or bundle['detail'].get('nearbyHomes') or [] if self._is_sold(prop)]
+        
+        subject = self._get_bundle_subject(address)
+        excluded = {subject.get('zpid')} if subject and subject.get('zpid') else set()
+        comparables = []
+        for prop in candidates:
+            if not isinstance(prop, dict) or (prop.get('zpid') and prop.get('zpid') in excluded):
+                continue
+            if prop.get('zpid'):
+                excluded.add(prop.get('zpid'))
+            comparables.append(self._format_property_data(prop))
+        # All candidates: the CMA engine ranks them and picks the comps
+        return comparables or None
+    
+    @staticmethod
+    def _is_sold(prop):
+        if not isinstance(prop, dict):
+            return False
+        status = str(prop.get('homeStatus') or prop.get('listingStatus') or '').upper()
+        return bool(prop.get('dateSold')) or status in ('RECENTLY_SOLD', 'SOLD')
     
     def _format_property_data(self, raw_data):
         """Format raw Zillow data for AI agent"""
@@ -256,6 +345,9 @@ Generate JSON with:
             'lotSize': raw_data.get('lotSize', 0),
             'yearBuilt': raw_data.get('yearBuilt', 'N/A'),
             'propertyType': raw_data.get('propertyType', 'Single Family'),
+            'latitude': raw_data.get('latitude'),
+            'longitude': raw_data.get('longitude'),
+            'dateSold': raw_data.get('dateSold'),
             'main_image_url': main_image_url
         }
     
@@ -279,6 +371,8 @@ Generate JSON with:
             elif isinstance(address, dict):
                 # Handle structured address object
                 parts = []
+                if address.get('streetAddress'):
+                    parts.append(address.get('streetAddress'))
                 if address.get('streetNumber'):
                     parts.append(str(address.get('streetNumber')))
                 if address.get('streetName'):
@@ -361,47 +455,30 @@ Generate JSON with:
         """Get enhanced property insights for UI display"""
         if not self.rapidapi_key:
             return self._get_mock_insights()
-            
-        headers = {
-            "X-RapidAPI-Key": self.rapidapi_key,
-            "X-RapidAPI-Host": "zillow-com1.p.rapidapi.com"
-        }
         
-        try:
-            search_url = "https://zillow-com1.p.rapidapi.com/propertyExtendedSearch"
-            search_params = {"location": address}
-            
-            response = requests.get(search_url, headers=headers, params=search_params)
-            
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('zpid'):
-                    # Get detailed property data
-                    detail_url = "https://zillow-com1.p.rapidapi.com/property"
-                    detail_params = {"zpid": data['zpid']}
-                    
-                    detail_response = requests.get(detail_url, headers=headers, params=detail_params)
-                    
-                    if detail_response.status_code == 200:
-                        detail_data = detail_response.json()
-                        return self._extract_insights(detail_data)
-            
-        except Exception as e:
-            print(f"Zillow insights error: {e}")
-            
-        return self._get_mock_insights()
+        return self._cached('insights', address, lambda: self._fetch_property_insights(address)) or self._get_mock_insights()
+    
+    def _fetch_property_insights(self, address):
+        bundle = self._get_property_bundle(address)
+        if not bundle or not bundle['detail']:
+            return None
+        return self._extract_insights(bundle['detail'])
     
     def _extract_insights(self, data):
         """Extract key insights from Zillow property data"""
         price = data.get('price', 0)
         living_area = data.get('livingArea', 1)
         
+        zestimate = data.get('zestimate', 'N/A')
+        if isinstance(zestimate, dict):
+            zestimate = zestimate.get('value', 'N/A')
+        
         return {
-            'zestimate': data.get('zestimate', {}).get('value', 'N/A'),
+            'zestimate': zestimate,
             'page_views': data.get('pageViewCount', 'N/A'),
             'days_on_market': data.get('timeOnZillow', 'N/A'),
             'price_per_sqft': round(price / living_area) if price and living_area else 'N/A',
-            'annual_taxes': data.get('taxHistory', [{}])[0].get('taxPaid', 'N/A'),
+            'annual_taxes': (data.get('taxHistory') or [{}])[0].get('taxPaid', 'N/A'),
             'school_rating': self._get_school_rating(data.get('schools', [])),
             'year_built': data.get('yearBuilt', 'N/A')
         }
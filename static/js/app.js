@@ -141,6 +141,24 @@ document.addEventListener('DOMContentLoaded', function() {
         event.target.classList.add('active');
     }
 
+    // Template picker lists whatever layouts the server has installed
+    const templateSelect = document.getElementById('template');
+    if (templateSelect) {
+        fetch('/flyer-layouts')
+            .then(response => response.json())
+            .then(result => {
+                if (!result.layouts || !result.layouts.length) return;
+                const selected = templateSelect.value;
+                templateSelect.innerHTML = result.layouts.map(layout =>
+                    `<option value="${layout.name}">${layout.label}</option>`
+                ).join('');
+                if (result.layouts.some(layout => layout.name === selected)) {
+                    templateSelect.value = selected;
+                }
+            })
+            .catch(error => console.error('Layout list error:', error));
+    }
+
     // Form submission handler
     const flyerForm = document.getElementById('flyer-form');
     if (flyerForm) {
@@ -160,6 +178,7 @@ document.addEventListener('DOMContentLoaded', function() {
             formData.append('bathrooms', document.getElementById('bathrooms').value);
             formData.append('template', document.getElementById('template').value);
             formData.append('format', document.getElementById('format').value);
+            formData.append('response_mode', 'url');
             
             // Add Zillow image URL if available
             const zillowImageUrl = document.getElementById('zillow_image_url')?.value;
@@ -184,13 +203,13 @@ document.addEventListener('DOMContentLoaded', function() {
                 
                 if (result.success) {
                     document.getElementById('preview-container').innerHTML = 
-                        `<img id="flyer-preview" src="${result.image}" alt="Generated Professional Flyer">`;
+                        `<img id="flyer-preview" src="${result.image_url || result.image}" alt="Generated Professional Flyer">`;
                     
                     // Show insights
                     displayInsights(result.neighborhood, result.mortgage, result.property_insights);
                     
-                    // Store flyer path
-                    window.currentFlyerPath = result.flyer_path;
+                    // Store flyer name
+                    window.currentFlyerName = result.flyer_name;
                 } else {
                     throw new Error(result.error || 'Failed to generate flyer');
                 }
@@ -207,6 +226,73 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
 
+    // Social kit: every format in the chosen template from one request
+    const generateKitBtn = document.getElementById('generate-kit-btn');
+    if (generateKitBtn) {
+        generateKitBtn.addEventListener('click', async function() {
+            if (!window.loadedPropertyData) {
+                alert('Please load property data from Zillow URL first!');
+                return;
+            }
+            
+            const template = document.getElementById('template').value;
+            const formData = new FormData();
+            formData.append('address', document.getElementById('address').value);
+            formData.append('price', document.getElementById('price').value);
+            formData.append('bedrooms', document.getElementById('bedrooms').value);
+            formData.append('bathrooms', document.getElementById('bathrooms').value);
+            formData.append('template', template);
+            formData.append('variants', JSON.stringify(
+                ['flyer', 'instagram', 'facebook', 'linkedin'].map(format => ({ format, template }))
+            ));
+            
+            const zillowImageUrl = document.getElementById('zillow_image_url')?.value;
+            if (zillowImageUrl) {
+                formData.append('zillow_image_url', zillowImageUrl);
+            }
+            
+            document.getElementById('loading').style.display = 'block';
+            document.getElementById('ai-status').style.display = 'block';
+            generateKitBtn.disabled = true;
+            generateKitBtn.textContent = '🔄 Generating...';
+            document.getElementById('error').style.display = 'none';
+            
+            try {
+                const response = await fetch('/generate-flyer-batch', {
+                    method: 'POST',
+                    body: formData
+                });
+                
+                const result = await response.json();
+                
+                if (result.success) {
+                    document.getElementById('preview-container').innerHTML = result.flyers.map(flyer =>
+                        `<div class="kit-item">
+                            <h4>${flyer.format}</h4>
+                            <a href="${flyer.image_url}" target="_blank"><img src="${flyer.image_url}" alt="${flyer.format} flyer"></a>
+                        </div>`
+                    ).join('');
+                    
+                    displayInsights(result.neighborhood, result.mortgage, result.property_insights);
+                    
+                    // Download/email act on the print flyer
+                    window.currentFlyerName = result.flyers[0].flyer_name;
+                } else {
+                    throw new Error(result.error || 'Failed to generate flyers');
+                }
+                
+            } catch (error) {
+                document.getElementById('error').textContent = `❌ ${error.message}`;
+                document.getElementById('error').style.display = 'block';
+            } finally {
+                document.getElementById('loading').style.display = 'none';
+                document.getElementById('ai-status').style.display = 'none';
+                generateKitBtn.disabled = false;
+                generateKitBtn.textContent = '📦 Generate Full Social Kit';
+            }
+        });
+    }
+
     function displayInsights(neighborhood, mortgage, property) {
         const container = document.getElementById('insights-container');
         const neighborhoodInfo = document.getElementById('neighborhood-info');
@@ -272,9 +358,8 @@ document.addEventListener('DOMContentLoaded', function() {
     const downloadBtn = document.getElementById('download-btn');
     if (downloadBtn) {
         downloadBtn.addEventListener('click', function() {
-            if (window.currentFlyerPath) {
-                const filename = window.currentFlyerPath.split('/').pop();
-                window.open(`/download-flyer/${filename}`, '_blank');
+            if (window.currentFlyerName) {
+                window.open(`/download-flyer/${window.currentFlyerName}`, '_blank');
             }
         });
     }
@@ -321,6 +406,108 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     }
     
+    // Streaming variant: renders each section as soon as its tokens arrive
+    async function streamAIEndpoint(endpoint, buttonId, resultTitle) {
+        const button = document.getElementById(buttonId);
+        const originalText = button.textContent;
+        
+        const addressInput = document.getElementById('shared-address') || document.getElementById('address');
+        const data = { address: addressInput.value };
+        
+        if (!data.address) {
+            alert('Please enter a property address first');
+            return;
+        }
+        
+        button.disabled = true;
+        button.textContent = '🔄 Generating...';
+        
+        const aiResultsContent = document.getElementById('ai-results-content');
+        const aiResultsDisplay = document.getElementById('ai-results-display');
+        
+        const sections = {
+            descriptions: { title: '📝 Property Descriptions:', background: '#f8f9fa' },
+            social: { title: '📱 Social Media Content:', background: '#f0f8ff' },
+            cma: { title: '📊 CMA Analysis:', background: '#f0fff0' }
+        };
+        
+        let html = `<h5>${resultTitle}</h5>`;
+        for (const [section, config] of Object.entries(sections)) {
+            html += `<div id="stream-${section}" style="background: ${config.background}; padding: 15px; border-radius: 8px; margin: 10px 0;">`;
+            html += `<h6>${config.title}</h6></div>`;
+        }
+        aiResultsContent.innerHTML = html;
+        aiResultsDisplay.style.display = 'block';
+        
+        function streamField(section, key) {
+            let field = document.getElementById(`stream-${section}-${key}`);
+            if (!field) {
+                const wrapper = document.createElement('div');
+                wrapper.style.cssText = 'margin: 10px 0; padding: 10px; background: white; border-radius: 5px;';
+                wrapper.innerHTML = `<strong>${key.replace('_', ' ').toUpperCase()}:</strong><br>`;
+                field = document.createElement('textarea');
+                field.id = `stream-${section}-${key}`;
+                field.readOnly = true;
+                field.style.cssText = 'width: 100%; height: 80px; margin-top: 5px; resize: none;';
+                wrapper.appendChild(field);
+                document.getElementById(`stream-${section}`).appendChild(wrapper);
+            }
+            return field;
+        }
+        
+        const finalResult = { success: true };
+        
+        function handleEvent(event) {
+            if (event.type === 'delta') {
+                streamField(event.section, event.key).value += event.text;
+            } else if (event.type === 'done') {
+                streamField(event.section, event.key).value = event.content;
+            } else if (event.type === 'cma_analysis') {
+                finalResult.cma_analysis = event.data;
+            } else if (event.type === 'complete') {
+                finalResult.descriptions = event.descriptions;
+                finalResult.social_content = event.social_content;
+            } else if (event.type === 'error') {
+                throw new Error(event.error);
+            }
+        }
+        
+        try {
+            const response = await fetch(endpoint, {
+                method: 'POST',
+                headers: {'Content-Type': 'application/json'},
+                body: JSON.stringify(data)
+            });
+            
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            
+            while (true) {
+                const { value, done } = await reader.read();
+                if (done) break;
+                
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
+                for (const line of lines) {
+                    if (line.trim()) handleEvent(JSON.parse(line));
+                }
+            }
+            if (buffer.trim()) handleEvent(JSON.parse(buffer));
+            
+            // Swap the streaming view for the standard layout once everything has arrived
+            if (finalResult.descriptions) {
+                displayAIResults(finalResult, resultTitle);
+            }
+        } catch (error) {
+            alert('❌ Error: ' + error.message);
+        } finally {
+            button.disabled = false;
+            button.textContent = originalText;
+        }
+    }
+    
     function displayAIResults(result, title) {
         const aiResultsContent = document.getElementById('ai-results-content');
         const aiResultsDisplay = document.getElementById('ai-results-display');
@@ -409,7 +596,7 @@ document.addEventListener('DOMContentLoaded', function() {
     const fullAgentBtn = document.getElementById('full-agent-btn');
     if (fullAgentBtn) {
         fullAgentBtn.addEventListener('click', function() {
-            callAIEndpoint('/ai-marketing-agent', 'full-agent-btn', '🚀 Complete Marketing Package Generated');
+            streamAIEndpoint('/ai-marketing-agent/stream', 'full-agent-btn', '🚀 Complete Marketing Package Generated');
         });
     }
 });
\ No newline at end of file